@@ -0,0 +1,184 @@
+# Read-only HTTP API for the dashboard's derived datasets, served from the same views (and the same
+# on-disk source cache and snapshots) as streamlit_app.py. Run with:
+#     uvicorn api:app --port 8000
+#
+#     GET /datasets                      -> the available datasets and their columns
+#     GET /datasets/<name>?columns=a,b&start=2022-01-01&end=2022-06-30&format=json|arrow|parquet
+#     GET /metrics                       -> per-stage timings of this process, in Prometheus text format
+
+# Libraries
+import asyncio
+import io
+import json
+from urllib.parse import parse_qs
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from data import load_view
+from metrics import METRICS
+from timeseries import query_range
+#############################################################################################################################
+
+# Public dataset name -> derived view
+DATASETS = {
+    'states': 'states',
+    'boroughs': 'boroughs',
+    'nyc_daily': 'nyc_daily',
+    'modzcta': 'modzcta',
+    'ny_state_cases': 'ny_state_cases',
+    'state_cases': 'state_cases',
+    'countries': 'countries',
+    'boro_population': 'boro_population',
+    'state_rates': 'state_rates',
+    'borough_rates': 'borough_rates',
+    'modzcta_rates': 'modzcta_rates',
+    'country_rates': 'country_rates',
+}
+
+# Columns of each dataset, listed by GET /datasets without downloading or parsing anything. Datasets with one
+# column per region found in the feed are described instead.
+COLUMNS = {
+    'states': ['state', 'id', 'population', 'cases', 'pct_Covid', 'completedVaccination', 'pct_Fully_Vaccinated',
+               'boosterDosesAdministered', 'pct_ReceivedBooster'],
+    'boroughs': ['CASE_RATE', 'CASE_COUNT'],
+    'nyc_daily': ['Avg_Total_City_Case_Count', 'BK_7Day_Avg', 'BX_7Day_Avg', 'MN_7Day_Avg', 'QN_7Day_Avg', 'SI_7Day_Avg'],
+    'modzcta': ['NEIGHBORHOOD_NAME', 'BOROUGH_GROUP', 'modzcta', 'zcta', 'COVID_CASE_COUNT', 'COVID_CASE_RATE',
+                'PERCENT_POSITIVE', 'label'],
+    'ny_state_cases': ['New York'],
+    'state_cases': 'one column per Province_State in the JHU confirmed cases feed',
+    'countries': ['location', 'total_cases_per_million'],
+    'boro_population': ['Latest Census Data'],
+    'state_rates': ['population', 'cases', 'completedVaccination', 'boosterDosesAdministered', 'pct_Covid',
+                    'pct_Fully_Vaccinated', 'pct_ReceivedBooster'],
+    'borough_rates': ['CASE_COUNT', 'CASE_RATE'],
+    'modzcta_rates': ['population', 'COVID_CASE_COUNT', 'PERCENT_POSITIVE', 'COVID_CASE_RATE'],
+    'country_rates': ['population', 'total_cases', 'total_cases_per_million'],
+}
+
+CONTENT_TYPES = {
+    'json': 'application/json',
+    'arrow': 'application/vnd.apache.arrow.stream',
+    'parquet': 'application/vnd.apache.parquet',
+    'prometheus': 'text/plain; version=0.0.4',
+}
+
+
+# Formats a dataset can be requested in
+FORMATS = ('json', 'arrow', 'parquet')
+
+
+class BadRequest(Exception):
+    status = 400
+
+
+class NotFound(BadRequest):
+    status = 404
+
+
+def _param(params, name):
+    values = params.get(name)
+    return values[-1] if values else None
+
+
+def _date(params, name):
+    value = _param(params, name)
+    if value is None:
+        return None
+    try:
+        date = pd.Timestamp(value)
+    except ValueError:
+        raise BadRequest(f'{name}: not a date: {value!r}')
+    # The time series are indexed by naive dates: times with a zone are compared in UTC
+    return date.tz_convert(None) if date.tz is not None else date
+
+
+# A dataset with the requested columns and date range applied
+def select(name, columns=None, start=None, end=None):
+    if name not in DATASETS:
+        raise NotFound(f'unknown dataset: {name!r}')
+    frame = load_view(DATASETS[name])
+
+    if start is not None or end is not None:
+        if not isinstance(frame.index, pd.DatetimeIndex):
+            raise BadRequest(f'{name} is not a time series; start/end do not apply')
+        frame = query_range(frame, start, end)
+
+    if columns:
+        missing = [c for c in columns if c not in frame.columns]
+        if missing:
+            raise BadRequest(f'unknown columns for {name}: {", ".join(missing)}')
+        frame = frame[columns]
+    return frame
+
+
+# Every format carries a named index (Date, Borough, fips, ...) as the first column; an unnamed one is only row
+# positions and is dropped
+def encode(frame, fmt):
+    frame = frame.reset_index(drop=frame.index.names == [None])
+    if fmt == 'json':
+        return frame.to_json(orient='records', date_format='iso').encode()
+
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    sink = io.BytesIO()
+    if fmt == 'arrow':
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+    else:
+        pq.write_table(table, sink)
+    return sink.getvalue()
+
+
+def _json_response(status, payload):
+    return status, CONTENT_TYPES['json'], json.dumps(payload).encode()
+
+
+# (status, content type, body) for a request
+def handle(method, path, params):
+    if method not in ('GET', 'HEAD'):
+        return _json_response(405, {'error': 'read-only API: only GET is supported'})
+
+    parts = [p for p in path.split('/') if p]
+    try:
+        if parts == ['datasets']:
+            return _json_response(200, COLUMNS)
+
+        if parts == ['metrics']:
+            return 200, CONTENT_TYPES['prometheus'], METRICS.prometheus().encode()
+
+        if len(parts) == 2 and parts[0] == 'datasets':
+            fmt = _param(params, 'format') or 'json'
+            if fmt not in FORMATS:
+                raise BadRequest(f'format must be one of: {", ".join(FORMATS)}')
+            columns = _param(params, 'columns')
+            frame = select(parts[1], columns.split(',') if columns else None,
+                           _date(params, 'start'), _date(params, 'end'))
+            return 200, CONTENT_TYPES[fmt], encode(frame, fmt)
+
+        raise NotFound(f'no such endpoint: {path}')
+    except BadRequest as error:
+        return _json_response(error.status, {'error': str(error)})
+
+#############################################################################################################################
+
+# ASGI entry point; loading a view can block on parsing, so requests are handled in a worker thread
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    if scope['type'] != 'http':
+        return
+
+    params = parse_qs(scope.get('query_string', b'').decode())
+    status, content_type, body = await asyncio.to_thread(handle, scope['method'], scope['path'], params)
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', content_type.encode()),
+                            (b'content-length', str(len(body)).encode())]})
+    await send({'type': 'http.response.body', 'body': b'' if scope['method'] == 'HEAD' else body})
@@ -0,0 +1,212 @@
+# Offline benchmark of the dashboard's data pipeline: every source is served from recorded fixture files,
+# the page is rendered section by section, and the time and peak memory of each stage (fetch, parse,
+# view, figure, render) are reported and compared against a saved baseline.
+#
+#     python benchmark.py record [--fixtures fixtures/recorded]          # download every feed once
+#     python benchmark.py synthesize --scale 4 [--fixtures ...] [--out fixtures/x4]
+#     python benchmark.py run [--fixtures ...] [--baseline benchmark-baseline.json] [--save-baseline]
+
+# Libraries
+import argparse
+import dataclasses
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+#############################################################################################################################
+
+ROOT = Path(__file__).parent
+FIXTURES = ROOT / 'fixtures' / 'recorded'
+BASELINE = ROOT / 'benchmark-baseline.json'
+
+# Feeds that grow with time (rows of days, counties or country-days); synthetic variants repeat their
+# data rows. The small snapshot feeds are joined on state/borough names and are kept as recorded.
+SCALABLE = ('jhu_confirmed', 'data_by_day', 'modzcta_caserate', 'owid')
+
+# Columns that identify a row and must stay unique when its rows are repeated: each copy gets a ' #n' suffix
+UNIQUE_COLUMNS = {'jhu_confirmed': ('Admin2', 'Combined_Key')}
+
+# A stage counts as a regression when it is this much slower than the baseline, and by at least MIN_DELTA seconds
+TOLERANCE = 0.20
+MIN_DELTA = 0.01
+
+
+def fixture_path(fixtures, name):
+    from ingest import INGEST_SPECS
+    return Path(fixtures) / f'{name}.{INGEST_SPECS[name].format}'
+
+
+# Download every source once, uncached, into the fixture directory
+def record(fixtures):
+    from sources import SOURCES, fetch
+    fixtures = Path(fixtures)
+    fixtures.mkdir(parents=True, exist_ok=True)
+    manifest = {}
+    for name, source in SOURCES.items():
+        result = fetch(name, source, cache=None)
+        fixture_path(fixtures, name).write_bytes(result.body)
+        manifest[name] = {'url': source.url, 'bytes': len(result.body), 'version': result.version,
+                          'recorded_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())}
+        print(f'{name}: {len(result.body):,} bytes')
+    (fixtures / 'manifest.json').write_text(json.dumps(manifest, indent=2))
+
+
+# A feed's data rows repeated `scale` times, with its identifying columns made unique per copy
+def repeat_rows(name, body, scale):
+    if name not in UNIQUE_COLUMNS:
+        header, _, rows = body.partition(b'\n')
+        rows = rows if rows.endswith(b'\n') else rows + b'\n'
+        return header + b'\n' + rows * scale
+
+    import pandas as pd
+    frame = pd.read_csv(io.BytesIO(body), dtype=str, keep_default_na=False)
+    copies = [frame.assign(**{column: frame[column] + (f' #{copy + 1}' if copy else '')
+                              for column in UNIQUE_COLUMNS[name]})
+              for copy in range(scale)]
+    return pd.concat(copies, ignore_index=True).to_csv(index=False).encode()
+
+
+# Copy of a fixture set with the growing feeds' data rows repeated `scale` times
+def synthesize(fixtures, out, scale):
+    fixtures, out = Path(fixtures), Path(out)
+    out.mkdir(parents=True, exist_ok=True)
+    for path in fixtures.iterdir():
+        if path.name == 'manifest.json':
+            continue
+        name = path.name.split('.')[0]
+        body = path.read_bytes()
+        if name in SCALABLE:
+            body = repeat_rows(name, body, scale)
+        (out / path.name).write_bytes(body)
+        print(f'{path.name}: {len(body):,} bytes')
+
+#############################################################################################################################
+
+# Each rerun replaces the page's elements, so a failed section is only visible right after it ran
+def check(page, section):
+    if page.exception:
+        raise SystemExit(f'{section} failed: {page.exception[0].value}')
+
+
+# Check a section, then switch on its toggles (the time-lapse maps) so their data and figures are measured too
+def exercise(page, section):
+    check(page, section)
+    for key in [toggle.key for toggle in page.toggle]:
+        page.toggle(key=key).set_value(True).run()
+        check(page, f'{section} ({key})')
+
+
+# Render every section of the page against the fixtures, with empty caches, and collect the stage metrics
+def run(fixtures, trace_memory=True):
+    # Both are read when the modules are imported, so they are set before importing anything of the app
+    os.environ['COVID_DASHBOARD_CACHE'] = tempfile.mkdtemp(prefix='covid-dashboard-bench-')
+    os.environ['COVID_DASHBOARD_TRACE_MEMORY'] = '1' if trace_memory else '0'
+    os.environ.pop('COVID_DASHBOARD_SHARED_CACHE', None)
+    sys.path.insert(0, str(ROOT))
+
+    import sources
+    from metrics import METRICS
+    from streamlit.testing.v1 import AppTest
+
+    for name, source in list(sources.SOURCES.items()):
+        path = fixture_path(fixtures, name)
+        if not path.exists():
+            raise SystemExit(f'missing fixture for {name}: {path} (run `python benchmark.py record` first)')
+        sources.SOURCES[name] = dataclasses.replace(source, url=path.resolve().as_uri())
+
+    start = time.perf_counter()
+    page = AppTest.from_file(str(ROOT / 'streamlit_app.py'), default_timeout=600).run()
+    sections = page.sidebar.radio[0].options
+    exercise(page, sections[0])
+    for section in sections[1:]:
+        page.sidebar.radio[0].set_value(section).run()
+        exercise(page, section)
+
+    return {'fixtures': str(fixtures), 'trace_memory': trace_memory, 'seconds': time.perf_counter() - start,
+            'stages': {f'{row["stage"]}:{row["name"]}': row for row in METRICS.summary()}}
+
+
+# Stages that got slower than the baseline by more than the tolerance, and baseline stages that no longer
+# ran at all (after is None): a section that stopped loading its data must not pass as a speedup
+def regressions(report, baseline, tolerance=TOLERANCE, min_delta=MIN_DELTA):
+    found = []
+    for key, before in baseline['stages'].items():
+        row = report['stages'].get(key)
+        if row is None:
+            found.append((key, before['total_seconds'], None))
+            continue
+        delta = row['total_seconds'] - before['total_seconds']
+        if delta > min_delta and delta > tolerance * before['total_seconds']:
+            found.append((key, before['total_seconds'], row['total_seconds']))
+    return found
+
+
+def print_report(report, baseline=None):
+    print(f'{"stage":<36}{"seconds":>10}{"baseline":>10}{"change":>9}{"peak MB":>9}{"rows":>10}{"MB":>9}')
+    for key, row in report['stages'].items():
+        before = (baseline or {'stages': {}})['stages'].get(key)
+        change = (f'{row["total_seconds"] / before["total_seconds"] - 1:+.0%}'
+                  if before and before['total_seconds'] else '')
+        peak = f'{row["peak_bytes"] / 2**20:.1f}' if row['peak_bytes'] is not None else ''
+        size = f'{row["bytes"] / 2**20:.2f}' if row['bytes'] is not None else ''
+        rows = f'{row["rows"]:,}' if row['rows'] is not None else ''
+        print(f'{key:<36}{row["total_seconds"]:>10.3f}'
+              f'{before["total_seconds"] if before else float("nan"):>10.3f}{change:>9}{peak:>9}{rows:>10}{size:>9}')
+
+    totals = {}
+    for row in report['stages'].values():
+        totals[row['stage']] = totals.get(row['stage'], 0) + row['total_seconds']
+    print('\n' + '  '.join(f'{stage}: {seconds:.3f}s' for stage, seconds in totals.items())
+          + f'  (page: {report["seconds"]:.2f}s)')
+
+#############################################################################################################################
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmark of the dashboard data pipeline")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    record_parser = commands.add_parser('record', help='download every source into a fixture directory')
+    record_parser.add_argument('--fixtures', default=FIXTURES)
+
+    synth_parser = commands.add_parser('synthesize', help='write a scaled-up copy of a fixture directory')
+    synth_parser.add_argument('--fixtures', default=FIXTURES)
+    synth_parser.add_argument('--scale', type=int, default=4)
+    synth_parser.add_argument('--out')
+
+    run_parser = commands.add_parser('run', help='benchmark the pipeline against a fixture directory')
+    run_parser.add_argument('--fixtures', default=FIXTURES)
+    run_parser.add_argument('--baseline', default=BASELINE)
+    run_parser.add_argument('--save-baseline', action='store_true', help='store this run as the new baseline')
+    run_parser.add_argument('--no-memory', action='store_true', help='skip peak memory tracing (faster)')
+
+    args = parser.parse_args(argv)
+    if args.command == 'record':
+        record(args.fixtures)
+    elif args.command == 'synthesize':
+        synthesize(args.fixtures, args.out or Path(args.fixtures).parent / f'x{args.scale}', args.scale)
+    else:
+        report = run(args.fixtures, trace_memory=not args.no_memory)
+        baseline_path = Path(args.baseline)
+        baseline = json.loads(baseline_path.read_text()) if baseline_path.exists() else None
+        print_report(report, baseline)
+        if baseline is not None and baseline.get('trace_memory') != report['trace_memory']:
+            print('warning: memory tracing differs from the baseline run, so timings are not comparable')
+        if args.save_baseline:
+            baseline_path.write_text(json.dumps(report, indent=2))
+            print(f'saved baseline to {baseline_path}')
+        elif baseline is not None:
+            slower = regressions(report, baseline)
+            for key, before, after in slower:
+                if after is None:
+                    print(f'MISSING {key}: ran in the baseline ({before:.3f}s) but not in this run')
+                else:
+                    print(f'REGRESSION {key}: {before:.3f}s -> {after:.3f}s')
+            return 1 if slower else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,188 @@
+# Libraries
+import hashlib
+import logging
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+#############################################################################################################################
+
+logger = logging.getLogger(__name__)
+
+# How long a replica may hold a key's refresh lock before others assume it died
+LOCK_LEASE = 5*60
+
+# How often a waiting replica checks whether the lock holder has finished
+POLL_INTERVAL = 0.1
+
+
+# In-process request coalescing: concurrent calls for the same key (a source download, a frame, a view)
+# wait on the one computation already in flight instead of starting their own
+class SingleFlight:
+    class _Call:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, compute):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = self._Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = compute()
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+
+# Shared cache for source downloads, parsed frames and derived views, so replicas fetch and compute each one
+# once. Values are pickled; when a key is missing, one caller takes the key's lock and computes
+# it while the others wait for the result (single-flight across replicas).
+class CacheBackend:
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value, ttl):
+        raise NotImplementedError
+
+    def acquire(self, key, token, lease):
+        raise NotImplementedError
+
+    def release(self, key, token):
+        raise NotImplementedError
+
+    @staticmethod
+    def _key(key):
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    # Hold the key's lock, or return early once another holder has stored the value
+    @contextmanager
+    def lock(self, key, lease=LOCK_LEASE):
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + lease
+        while not self.acquire(key, token, lease):
+            if self.get(key) is not None or time.monotonic() > deadline:
+                yield False
+                return
+            time.sleep(POLL_INTERVAL)
+        try:
+            yield True
+        finally:
+            self.release(key, token)
+
+    def get_or_compute(self, key, compute, ttl):
+        key = self._key(key)
+        value = self.get(key)
+        if value is not None:
+            return pickle.loads(value)
+
+        with self.lock(key):
+            value = self.get(key)  # filled in by another replica while we waited
+            if value is not None:
+                return pickle.loads(value)
+            result = compute()
+            self.set(key, pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL), ttl)
+            return result
+
+
+# File-based backend for replicas on one host (worker processes, containers sharing a local volume): one
+# SQLite database in WAL mode, which relies on shared memory between the processes and so does not work over a
+# network filesystem. Replicas on different hosts share a RedisBackend instead.
+class SQLiteBackend(CacheBackend):
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB, expires REAL)')
+            conn.execute('CREATE TABLE IF NOT EXISTS locks (key TEXT PRIMARY KEY, token TEXT, expires REAL)')
+
+    # sqlite3 connections can't be shared between threads
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        return conn
+
+    def get(self, key):
+        row = self._connect().execute('SELECT value FROM entries WHERE key = ? AND expires > ?',
+                                      (key, time.time())).fetchone()
+        return None if row is None else row[0]
+
+    def set(self, key, value, ttl):
+        conn = self._connect()
+        conn.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?)', (key, value, time.time() + ttl))
+        conn.execute('DELETE FROM entries WHERE expires <= ?', (time.time(),))
+
+    def acquire(self, key, token, lease):
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('DELETE FROM locks WHERE key = ? AND expires <= ?', (key, time.time()))
+            acquired = conn.execute('INSERT OR IGNORE INTO locks VALUES (?, ?, ?)',
+                                    (key, token, time.time() + lease)).rowcount == 1
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return acquired
+
+    def release(self, key, token):
+        self._connect().execute('DELETE FROM locks WHERE key = ? AND token = ?', (key, token))
+
+
+# Redis backend (needs the optional `redis` package)
+class RedisBackend(CacheBackend):
+    # Delete the lock only if we still own it
+    RELEASE = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+
+    def __init__(self, url, prefix='covid_dashboard:'):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, value, ex=int(ttl))
+
+    def acquire(self, key, token, lease):
+        return bool(self.client.set(self.prefix + 'lock:' + key, token, nx=True, px=int(lease * 1000)))
+
+    def release(self, key, token):
+        self.client.eval(self.RELEASE, 1, self.prefix + 'lock:' + key, token)
+
+
+# Backend from a URL: 'sqlite:///path/to/cache.db' or 'redis://host:6379/0'; None/empty disables sharing
+def backend_from_url(url):
+    if not url:
+        return None
+    if url.startswith('sqlite:///'):
+        return SQLiteBackend(url[len('sqlite:///'):])
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisBackend(url)
+    raise ValueError(f'unsupported cache backend: {url!r}')
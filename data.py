@@ -0,0 +1,393 @@
+# Libraries
+import json
+import os
+from dataclasses import dataclass
+from functools import partial
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from cache_backend import SingleFlight, backend_from_url
+from geo import prepare_geojson
+from ingest import INGEST_SPECS, read_incremental, read_source, read_stream
+from metrics import measure
+from rates import PER_100K, PER_MILLION, PERCENT, align, region_counts
+from refresh import REFRESH_INTERVAL, Refresher
+from regions import BOROUGH_REGIONS, STATE_REGIONS, iso_codes, iso_ids, modzcta_ids
+from snapshots import SNAPSHOTS
+from sources import DISK_CACHE, SOURCES, digest, fetch_all, load_cached
+from timeseries import CaseMatrix, FrameCube, build_rollups, state_totals
+#############################################################################################################################
+
+# Optional cache shared by replicas for source downloads, parsed frames and views: sqlite:////path/cache.db for
+# processes on one host, redis://host:6379/0 across hosts. Frame and view keys include the source versions,
+# so those entries only expire to free space.
+SHARED_CACHE = backend_from_url(os.environ.get('COVID_DASHBOARD_SHARED_CACHE'))
+SHARED_TTL = 60*60*24
+
+
+# Concurrent sessions asking for the same frame or view share one computation
+FLIGHTS = SingleFlight()
+
+
+def shared(key, compute):
+    if SHARED_CACHE is None:
+        return FLIGHTS.do(key, compute)
+    return FLIGHTS.do(key, lambda: SHARED_CACHE.get_or_compute(key, compute, SHARED_TTL))
+
+
+# Loading source data: one refresher per process. Only the first request for a source without a snapshot on disk
+# waits on its download; after that (and after a restart) pages read the last good snapshot while the refresher
+# revalidates sources in the background.
+@st.cache_resource
+def refresher():
+    return Refresher(partial(fetch_all, shared=SHARED_CACHE), REFRESH_INTERVAL, on_refresh=warm_views,
+                     cached=load_cached).start()
+
+
+def load_sources(*names):
+    return refresher().current(names)
+
+
+# Parsed frames are cached per download version, so a refreshed source is re-read and an unchanged one never is.
+# The download itself is passed along (unhashed, as _result), so the frame cached under a version is always
+# parsed from that version even if the refresher swaps in a newer one meanwhile.
+def load_df(name, result=None):
+    result = load_sources(name)[name] if result is None else result
+    return _load_df(name, result.version, result)
+
+
+@st.cache_data(max_entries=32)
+def _load_df(name, version, _result):
+    return shared(f'frame:{name}:{version}',
+                  lambda: SNAPSHOTS.load(snapshot_name(name), version, lambda: parse_source(name, _result)))
+
+
+def snapshot_name(name):
+    return f'{name}.r{INGEST_SPECS[name].revision}'
+
+
+# Append-only feeds are parsed incrementally from the previous snapshot when it is still around;
+# streamed feeds are folded straight from their snapshot on disk
+def parse_source(name, result):
+    with measure('parse', name) as m:
+        return m.observe(_parse_source(name, result))
+
+
+def _parse_source(name, result):
+    if INGEST_SPECS[name].incremental and result.previous_version:
+        previous = SNAPSHOTS.read(snapshot_name(name), result.previous_version)
+        previous_body = DISK_CACHE.load_previous(SOURCES[name].url)
+        # Another worker may have rotated the previous body on disk since this download was fetched
+        if previous is not None and previous_body is not None and digest(previous_body) == result.previous_version:
+            return read_incremental(name, previous_body, previous, result.body)
+    if INGEST_SPECS[name].fold is not None:
+        with result.open() as stream:
+            return read_stream(name, stream)
+    return read_source(name, result.body)
+
+
+# Loading json using cache
+def load_json(name, result=None):
+    result = load_sources(name)[name] if result is None else result
+    return _load_json(name, result.version, result)
+
+
+@st.cache_data(max_entries=8)
+def _load_json(name, version, _result):
+    return json.loads(_result.body)
+
+#############################################################################################################################
+
+# Derived views: named transforms of source frames (or of other views).
+# Each view is cached against the versions of the sources it depends on, so a widget rerun reuses
+# every view and a data refresh only rebuilds the views downstream of the sources that changed.
+# Views are cached with st.cache_data, which hands each rerun its own copy; large read-only arrays that a page
+# reads on every widget interaction are marked resource=True and held once per process (st.cache_resource).
+@dataclass(frozen=True)
+class View:
+    name: str
+    inputs: tuple
+    build: object
+    resource: bool = False
+
+
+VIEWS = {}
+
+
+def view(*inputs, resource=False):
+    def register(build):
+        VIEWS[build.__name__] = View(build.__name__, inputs, build, resource)
+        return build
+    return register
+
+
+# Source datasets a view depends on, directly or through other views
+def view_sources(name):
+    found = set()
+    for dep in VIEWS[name].inputs:
+        found |= view_sources(dep) if dep in VIEWS else {dep}
+    return found
+
+
+# results: downloads to build from (by default the current ones); a view and everything it is built from
+# always use the same set, the one its cache key was taken from
+def load_view(name, results=None):
+    sources = view_sources(name)
+    results = load_sources(*sources) if results is None else results
+    versions = tuple(sorted((source, results[source].version) for source in sources))
+    build_view = _build_view_resource if VIEWS[name].resource else _build_view
+    return build_view(name, versions, results)
+
+
+# Downloads behind one or more views (or sources), fetched in one batch
+def load_view_sources(*names):
+    sources = set().union(*(view_sources(name) if name in VIEWS else {name} for name in names))
+    results = load_sources(*sources)
+    return {source: results[source] for source in sources}
+
+
+# Content version of the source data behind one or more views (or sources), used to key caches downstream of them
+def data_version(*names):
+    results = load_view_sources(*names)
+    return '-'.join(results[source].version for source in sorted(results))
+
+
+@st.cache_data(max_entries=64)
+def _build_view(name, versions, _results):
+    return compute_view(name, versions, _results)
+
+
+@st.cache_resource(max_entries=16)
+def _build_view_resource(name, versions, _results):
+    return compute_view(name, versions, _results)
+
+
+def compute_view(name, versions, results):
+    def build():
+        inputs = [load_view(dep, results) if dep in VIEWS else load_df(dep, result=results[dep])
+                  for dep in VIEWS[name].inputs]
+        with measure('view', name) as m:
+            return m.observe(VIEWS[name].build(*inputs))
+    return shared(f'view:{name}:{versions}', build)
+
+
+# Rebuild the views right after a refresh so the parsing happens in the refresher, not in a page render.
+# Only views over sources some page has already loaded are rebuilt; the rest stay unfetched.
+def warm_views():
+    loaded = set(load_sources())
+    for name in VIEWS:
+        if view_sources(name) <= loaded:
+            load_view(name)
+    if view_sources('modzcta') <= loaded:
+        load_map_geojson()
+
+#############################################################################################################################
+
+# Adjustments and Merging dataframes
+
+# Per-capita rates: each geography level's counts and populations are aligned on integer region ids
+# (state FIPS, borough code, MODZCTA, ISO code) and all of its rates are computed in one vectorized pass
+
+# US states and territories: cases (NYT, by FIPS) and vaccinations and population (Bloomberg, by postal code)
+@view('us_states', 'vaccines')
+def state_rates(df1, df2):
+    # Bloomberg's federal agencies and freely associated states have no id and drop out of the join
+    fips = df1['fips'].fillna(-1).to_numpy(dtype=np.int64)
+    bloomberg_ids = STATE_REGIONS.ids_for(df2['id'])
+
+    counts = region_counts('fips', STATE_REGIONS.ids, (bloomberg_ids, df2['population']),
+                           {'cases': (fips, df1['cases']),
+                            'completedVaccination': (bloomberg_ids, df2['completedVaccination']),
+                            'boosterDosesAdministered': (bloomberg_ids, df2['boosterDosesAdministered'])},
+                           {'pct_Covid': ('cases', PERCENT),
+                            'pct_Fully_Vaccinated': ('completedVaccination', PERCENT),
+                            'pct_ReceivedBooster': ('boosterDosesAdministered', PERCENT)})
+    return counts.compute()
+
+
+# States with both case and vaccination data, by cases (descending)
+@view('state_rates')
+def states(rates):
+    df = rates.dropna(subset=['cases', 'population'])
+    df = df.assign(state=STATE_REGIONS.categorical(df.index).astype(str),
+                   id=STATE_REGIONS.categorical(df.index, codes=True).astype(str))
+    df = df.sort_values(by='cases', ascending=False).reset_index(drop=True)
+
+    # Rearranging columns
+    return df[['state','id','population','cases',
+               'pct_Covid','completedVaccination','pct_Fully_Vaccinated',
+               'boosterDosesAdministered','pct_ReceivedBooster']]
+
+
+# Cleaning and dealing with 0 values and NaNs
+@view('states')
+def states_by_covid(df):
+    cleaned = df.dropna(subset=['cases'])
+    cleaned = cleaned[cleaned.cases != 0]
+    return cleaned.sort_values(by='pct_Covid')
+
+
+# States ordered by the share of their population that is fully vaccinated
+@view('states')
+def states_by_vaccination(df):
+    return df.sort_values(by='pct_Fully_Vaccinated', ascending=True)
+
+
+# Boroughs: NYC Health's case counts and its published case rates (per 100K, over its own population
+# estimates), placed on borough codes. Like PERCENT_POSITIVE for zip codes, the rate is passed through as
+# published, so the borough pie keeps NYC Health's definition and doesn't depend on the census page.
+@view('boro_totals')
+def borough_rates(df4):
+    # 'Citywide' has no borough id and drops out
+    codes = BOROUGH_REGIONS.ids_for(df4['subgroup'])
+    return pd.DataFrame({column: align(BOROUGH_REGIONS.ids, codes, df4[column]) for column in ('CASE_COUNT', 'CASE_RATE')},
+                        index=pd.Index(BOROUGH_REGIONS.ids, name='borough'))
+
+
+# Setting up Borough data in df4 (data frame 4)
+@view('borough_rates')
+def boroughs(rates):
+    df4 = rates.dropna(subset=['CASE_COUNT'])
+    df4.index = pd.CategoricalIndex(BOROUGH_REGIONS.categorical(df4.index), name='Borough')
+    return df4[['CASE_RATE','CASE_COUNT']]
+
+
+# Zip codes (MODZCTA): case counts over NYC Health's population denominators, per 100K people.
+# PERCENT_POSITIVE is a share of tests, not of people, so it is kept as published.
+@view('modzcta_totals')
+def modzcta_rates(df6):
+    ids = df6['MODIFIED_ZCTA'].to_numpy(dtype=np.int64)
+    counts = region_counts('modzcta', ids, (ids, df6['POP_DENOMINATOR']),
+                           {'COVID_CASE_COUNT': (ids, df6['COVID_CASE_COUNT']),
+                            'PERCENT_POSITIVE': (ids, df6['PERCENT_POSITIVE'])},
+                           {'COVID_CASE_RATE': ('COVID_CASE_COUNT', PER_100K)})
+    return counts.compute()
+
+
+# Countries (OWID): latest cumulative cases over population, per million people.
+# OWID is parsed straight into one row per country holding its latest values (see ingest.LatestByKey).
+@view('owid')
+def country_rates(df8):
+    ids = iso_ids(df8['iso_code'].astype(str))
+    counts = region_counts('iso', ids, (ids, df8['population']),
+                           {'total_cases': (ids, df8['total_cases'])},
+                           {'total_cases_per_million': ('total_cases', PER_MILLION)})
+    return counts.compute()
+
+
+# Setting up NY State data in df3 (data frame 3)
+@view('jhu_confirmed')
+def ny_state_cases(df3):
+    return state_totals(df3, ['New York'])
+
+
+# Confirmed cases for every state (dates x states)
+@view('jhu_confirmed')
+def state_cases(df3):
+    return state_totals(df3)
+
+
+# Every state and county (regions x dates) as one compact array, for the explorer
+@view('jhu_confirmed', resource=True)
+def jhu_matrix(df3):
+    return CaseMatrix.from_jhu(df3)
+
+
+# Time-lapse of the US map: daily new cases (7-day average) per 100K by state, one frame a week
+@view('jhu_matrix', 'state_rates', resource=True)
+def state_cube(matrix, rates):
+    fips = STATE_REGIONS.ids_for(matrix.states)
+    known = fips >= 0
+    daily = matrix.series(list(matrix.states[known]), measure='daily_avg7')
+    population = rates['population'].reindex(fips[known]).to_numpy()
+    per_100k = daily.to_numpy() * PER_100K / np.where(population > 0, population, np.nan)
+    postal = STATE_REGIONS.categorical(fips[known], codes=True).astype(str)
+    return FrameCube.from_frame(pd.DataFrame(per_100k, index=daily.index, columns=postal), step=7)
+
+
+# Time-lapse of the NYC map: NYC Health's weekly case rate per 100K by zip code
+@view('modzcta_caserate', resource=True)
+def modzcta_cube(df):
+    frame = df.set_index(pd.to_datetime(df['week_ending'])).drop(columns='week_ending').sort_index()
+    frame.columns = [column[len('CASERATE_'):] for column in frame.columns]
+    return FrameCube.from_frame(frame)
+
+
+# Weekly/monthly rollups for long-horizon views
+@view('state_cases')
+def state_rollups(state_cases):
+    return build_rollups(state_cases)
+
+
+@view('nyc_daily')
+def nyc_daily_rollups(df5):
+    return build_rollups(df5)
+
+
+# Setting up Borough data in df5 (data frame 5)
+@view('data_by_day')
+def nyc_daily(df5):
+    df5 = df5.copy()
+    df5['date_of_interest'] = pd.to_datetime(df5['date_of_interest'])
+    df5 = df5[['date_of_interest','ALL_CASE_COUNT_7DAY_AVG',
+               'BK_ALL_CASE_COUNT_7DAY_AVG','BX_ALL_CASE_COUNT_7DAY_AVG',
+               'MN_ALL_CASE_COUNT_7DAY_AVG','QN_ALL_CASE_COUNT_7DAY_AVG',
+               'SI_ALL_CASE_COUNT_7DAY_AVG']]
+    df5 = df5.rename(columns={df5.columns[0]:"Date",
+                              df5.columns[1]:"Avg_Total_City_Case_Count",
+                              df5.columns[2]:"BK_7Day_Avg",
+                              df5.columns[3]:"BX_7Day_Avg",
+                              df5.columns[4]:"MN_7Day_Avg",
+                              df5.columns[5]:"QN_7Day_Avg",
+                              df5.columns[6]:"SI_7Day_Avg"})
+    return df5.set_index('Date').sort_index()
+
+
+# Setting up data in merged data frame "df_MODZCTA_merge", joined on the integer MODZCTA code
+# (df7 is the MODZCTA geojson's feature properties; the geometry itself is drawn from the same download)
+@view('modzcta_totals', 'modzcta_rates', 'modzcta_geojson')
+def modzcta(df6, rates, df7):
+    df6 = df6.drop(columns=['COVID_CASE_COUNT', 'PERCENT_POSITIVE'])
+    df6 = df6.join(rates[['COVID_CASE_COUNT', 'COVID_CASE_RATE', 'PERCENT_POSITIVE']], on='MODIFIED_ZCTA')
+    df7 = df7.drop(columns=['label']).set_index(pd.Index(modzcta_ids(df7['modzcta']), name='MODIFIED_ZCTA'))
+    df_MODZCTA_merge = df6.join(df7, on='MODIFIED_ZCTA', how='inner')
+    return df_MODZCTA_merge[['NEIGHBORHOOD_NAME','BOROUGH_GROUP',
+                             'modzcta','zcta','COVID_CASE_COUNT',
+                             'COVID_CASE_RATE','PERCENT_POSITIVE',
+                             'label']]
+
+
+# Borough populations (latest census) from citypopulation.de
+@view('boro_pop')
+def boro_population(boro_pop):
+    boro_pop = boro_pop.iloc[:, [0,-2]]
+    boro_pop = boro_pop.set_index('Name')
+    return boro_pop.rename(columns={boro_pop.columns[0]: "Latest Census Data" })
+
+
+# Setting up data/ grouping data in df8: one row per country, with its name and latest cases per million
+@view('owid', 'country_rates')
+def countries(df8, rates):
+    location = np.full(len(rates), '', dtype=object)
+    location[np.searchsorted(rates.index, iso_ids(df8['iso_code'].astype(str)))] = df8['location'].astype(str).to_numpy()
+    return pd.DataFrame({'location': location,
+                         'total_cases_per_million': rates['total_cases_per_million'].to_numpy()},
+                        index=pd.Index(iso_codes(rates.index), name='iso_code'))
+
+
+# NYC MODZCTA geojson trimmed to the zip codes on the map and simplified for its zoom level
+def load_map_geojson():
+    results = load_view_sources('modzcta', 'modzcta_geojson')
+    return _load_map_geojson('-'.join(results[source].version for source in sorted(results)), results)
+
+
+@st.cache_data(max_entries=4)
+def _load_map_geojson(version, _results):
+    def build():
+        geojson = load_json('modzcta_geojson', _results['modzcta_geojson'])
+        ids = load_view('modzcta', _results)['modzcta']
+        with measure('view', 'map_geojson'):
+            return prepare_geojson(geojson, ids)
+    return FLIGHTS.do(f'geojson:{version}', build)
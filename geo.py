@@ -0,0 +1,97 @@
+# Libraries
+import math
+
+import numpy as np
+#############################################################################################################################
+
+# Web-mercator ground resolution at zoom 0, in meters per pixel at the equator
+EQUATOR_METERS_PER_PIXEL = 156543.03
+METERS_PER_DEGREE = 111320
+
+# Default map view of the MODZCTA choropleth
+MAP_ZOOM = 9.3
+MAP_CENTER = {"lat": 40.7, "lon": -73.99}
+
+# Coordinates are rounded to this many decimal places (~10m, well under a pixel at the default zoom)
+COORDINATE_DIGITS = 4
+
+
+# Largest error (in degrees) that stays within a fraction of a pixel at the given zoom and latitude
+def tolerance_for_zoom(zoom=MAP_ZOOM, lat=MAP_CENTER['lat'], pixels=0.5):
+    meters_per_pixel = EQUATOR_METERS_PER_PIXEL * math.cos(math.radians(lat)) / 2 ** zoom
+    return pixels * meters_per_pixel / METERS_PER_DEGREE
+
+
+# Douglas-Peucker simplification of an (n, 2) array of points
+def simplify_line(points, tolerance):
+    n = len(points)
+    if n < 3:
+        return points
+
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        start, end = points[first], points[last]
+        inner = points[first + 1:last]
+        dx, dy = end - start
+        length = math.hypot(dx, dy)
+        if length == 0:  # closed ring: measure from the shared start/end point
+            distance = np.hypot(inner[:, 0] - start[0], inner[:, 1] - start[1])
+        else:
+            distance = np.abs(dx * (inner[:, 1] - start[1]) - dy * (inner[:, 0] - start[0])) / length
+        i = int(np.argmax(distance))
+        if distance[i] > tolerance:
+            split = first + 1 + i
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return points[keep]
+
+
+# Simplify and quantize a polygon ring; returns None if it collapses below a valid ring
+def simplify_ring(ring, tolerance, digits=COORDINATE_DIGITS):
+    points = np.round(simplify_line(np.asarray(ring, dtype=float), tolerance), digits)
+    # Rounding can leave consecutive duplicates
+    points = points[np.r_[True, np.any(np.diff(points, axis=0) != 0, axis=1)]]
+    if len(points) < 4:
+        return None
+    return points.tolist()
+
+
+def simplify_polygon(rings, tolerance, digits=COORDINATE_DIGITS):
+    exterior, *holes = rings
+    simplified = simplify_ring(exterior, tolerance, digits)
+    if simplified is None:  # keep tiny polygons, just quantized
+        simplified = np.round(np.asarray(exterior, dtype=float), digits).tolist()
+    holes = [hole for hole in (simplify_ring(h, tolerance, digits) for h in holes) if hole is not None]
+    return [simplified] + holes
+
+
+def simplify_geometry(geometry, tolerance, digits=COORDINATE_DIGITS):
+    if geometry['type'] == 'Polygon':
+        coordinates = simplify_polygon(geometry['coordinates'], tolerance, digits)
+    elif geometry['type'] == 'MultiPolygon':
+        coordinates = [simplify_polygon(polygon, tolerance, digits) for polygon in geometry['coordinates']]
+    else:
+        return geometry
+    return {'type': geometry['type'], 'coordinates': coordinates}
+
+
+# Smallest FeatureCollection that still draws the map: only the features being plotted, only the
+# property the choropleth joins on, and geometry simplified/quantized for the default zoom level
+def prepare_geojson(geojson, keep_ids, id_property='modzcta', tolerance=None, digits=COORDINATE_DIGITS):
+    tolerance = tolerance_for_zoom() if tolerance is None else tolerance
+    keep_ids = {str(i) for i in keep_ids}
+    features = []
+    for feature in geojson['features']:
+        feature_id = str(feature['properties'].get(id_property))
+        if feature_id not in keep_ids or feature.get('geometry') is None:
+            continue
+        features.append({'type': 'Feature',
+                         'properties': {id_property: feature_id},
+                         'geometry': simplify_geometry(feature['geometry'], tolerance, digits)})
+    return {'type': 'FeatureCollection', 'features': features}
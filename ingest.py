@@ -0,0 +1,207 @@
+# Libraries
+import io
+import json
+import re
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+#############################################################################################################################
+
+# JHU time series headers are dates like '1/22/20'
+JHU_DATE = re.compile(r'^\d{1,2}/\d{1,2}/\d{2}$')
+
+
+# How a source CSV is read: only the columns the dashboard uses, with compact dtypes.
+# usecols/dtype may be callables that are resolved against the CSV header (e.g. JHU's date columns).
+# Bump revision whenever a spec changes so snapshots parsed under the old spec are not reused.
+@dataclass(frozen=True)
+class IngestSpec:
+    usecols: object = None
+    dtype: object = None
+    index_col: object = None
+    engine: str = 'pyarrow'
+    format: str = 'csv'
+    incremental: str = None  # 'rows' for feeds that append lines, 'columns' for feeds that append date columns
+    fold: object = None  # read in chunks of rows and folded into running aggregates (e.g. LatestByKey) instead of held whole
+    revision: int = 1
+
+
+def jhu_usecols(header):
+    return ['Admin2', 'Province_State'] + [c for c in header if JHU_DATE.match(c)]
+
+
+def jhu_dtype(columns):
+    return {c: ('category' if c in ('Admin2', 'Province_State') else 'int32') for c in columns}
+
+
+# NYC Health's weekly case rates have one CASERATE_<zip> column per MODZCTA (plus city and borough columns)
+MODZCTA_RATE = re.compile(r'^CASERATE_\d{5}$')
+
+
+def modzcta_rate_usecols(header):
+    return ['week_ending'] + [c for c in header if MODZCTA_RATE.match(c)]
+
+
+def modzcta_rate_dtype(columns):
+    return {c: (str if c == 'week_ending' else 'float32') for c in columns}
+
+
+# Running aggregate of a CSV read in chunks: every column's latest non-missing value per key, in file order.
+# What is held between chunks has one row per key, however many rows the file has.
+@dataclass(frozen=True)
+class LatestByKey:
+    key: str
+
+    def fold(self, chunks):
+        latest = None
+        for chunk in chunks:
+            last = chunk.groupby(self.key, sort=False).last()
+            latest = last if latest is None else last.combine_first(latest)
+        return latest.reset_index() if latest is not None else None
+
+
+INGEST_SPECS = {
+    'us_states': IngestSpec(usecols=['fips', 'cases'], dtype={'fips': 'Int32', 'cases': 'float32'}, revision=3),
+    'vaccines': IngestSpec(usecols=['id', 'peopleVaccinated', 'completedVaccination',
+                                    'boosterDosesAdministered', 'population'],
+                           dtype={'id': 'category', 'peopleVaccinated': 'float32',
+                                  'completedVaccination': 'float32', 'boosterDosesAdministered': 'float32',
+                                  'population': 'float32'},
+                           revision=2),
+    'jhu_confirmed': IngestSpec(usecols=jhu_usecols, dtype=jhu_dtype, incremental='columns', revision=2),
+    'boro_totals': IngestSpec(usecols=['subgroup', 'CASE_RATE', 'CASE_COUNT'],
+                              dtype={'subgroup': str, 'CASE_RATE': 'float32', 'CASE_COUNT': 'float32'}),
+    'data_by_day': IngestSpec(usecols=['date_of_interest', 'ALL_CASE_COUNT_7DAY_AVG',
+                                       'BK_ALL_CASE_COUNT_7DAY_AVG', 'BX_ALL_CASE_COUNT_7DAY_AVG',
+                                       'MN_ALL_CASE_COUNT_7DAY_AVG', 'QN_ALL_CASE_COUNT_7DAY_AVG',
+                                       'SI_ALL_CASE_COUNT_7DAY_AVG'],
+                              dtype={'date_of_interest': str, 'ALL_CASE_COUNT_7DAY_AVG': 'float32',
+                                     'BK_ALL_CASE_COUNT_7DAY_AVG': 'float32', 'BX_ALL_CASE_COUNT_7DAY_AVG': 'float32',
+                                     'MN_ALL_CASE_COUNT_7DAY_AVG': 'float32', 'QN_ALL_CASE_COUNT_7DAY_AVG': 'float32',
+                                     'SI_ALL_CASE_COUNT_7DAY_AVG': 'float32'},
+                              incremental='rows'),
+    'modzcta_totals': IngestSpec(usecols=['MODIFIED_ZCTA', 'label', 'NEIGHBORHOOD_NAME', 'BOROUGH_GROUP',
+                                          'COVID_CASE_COUNT', 'POP_DENOMINATOR', 'PERCENT_POSITIVE'],
+                                 dtype={'MODIFIED_ZCTA': 'int32', 'label': str, 'NEIGHBORHOOD_NAME': str,
+                                        'BOROUGH_GROUP': 'category', 'COVID_CASE_COUNT': 'float32',
+                                        'POP_DENOMINATOR': 'float32', 'PERCENT_POSITIVE': 'float32'},
+                                 revision=2),
+    'modzcta_caserate': IngestSpec(usecols=modzcta_rate_usecols, dtype=modzcta_rate_dtype, incremental='rows'),
+    'modzcta_geojson': IngestSpec(dtype={'modzcta': str, 'label': str, 'zcta': str}, format='geojson'),
+    'boro_pop': IngestSpec(format='html'),
+    # OWID's full history (one row per country per day) is only ever used for each country's latest values
+    'owid': IngestSpec(usecols=['iso_code', 'location', 'total_cases', 'population'],
+                       dtype={'iso_code': 'category', 'location': 'category',
+                              'total_cases': 'float64', 'population': 'float64'},
+                       fold=LatestByKey('iso_code'), revision=3),
+}
+
+
+# Parse a downloaded CSV (or a geojson's feature properties, or a page's first html table) according to its ingestion spec
+def read_source(name, body):
+    spec = INGEST_SPECS[name]
+    if spec.fold is not None:
+        return read_stream(name, io.BytesIO(body))
+    if spec.format == 'html':
+        return pd.read_html(io.BytesIO(body))[0]
+    if spec.format == 'geojson':
+        properties = pd.DataFrame([feature['properties'] for feature in json.loads(body)['features']])
+        return properties.astype(spec.dtype)
+
+    usecols, dtype = spec.usecols, spec.dtype
+    if callable(usecols) or callable(dtype):
+        header = list(pd.read_csv(io.BytesIO(body), nrows=0).columns)
+        if callable(usecols):
+            usecols = usecols(header)
+        if callable(dtype):
+            dtype = dtype(usecols or header)
+
+    return pd.read_csv(io.BytesIO(body), usecols=usecols, dtype=dtype,
+                       index_col=spec.index_col, engine=spec.engine)
+
+
+# Rows read at a time from a streamed source
+STREAM_ROWS = 100_000
+
+
+# Fold a CSV into its spec's running aggregate, STREAM_ROWS rows at a time. The stream is any binary file object
+# (a snapshot on disk, an HTTP response), so neither the download nor the parsed rows are ever held whole.
+# Categorical columns are read as strings while folding, since each chunk would infer its own categories.
+def read_stream(name, stream):
+    spec = INGEST_SPECS[name]
+    dtype = {column: (str if kind == 'category' else kind) for column, kind in spec.dtype.items()}
+    chunks = pd.read_csv(stream, usecols=spec.usecols, dtype=dtype, chunksize=STREAM_ROWS)
+    folded = spec.fold.fold(chunks)
+    if folded is None:
+        folded = pd.DataFrame(columns=spec.usecols)
+    return folded[spec.usecols].astype(spec.dtype)
+
+#############################################################################################################################
+
+# Incremental parsing of append-only feeds: given the previous download and the frame parsed from it,
+# only the bytes that changed are parsed. Anything that is not a pure append falls back to a full parse.
+def read_incremental(name, old_body, old_frame, body):
+    spec = INGEST_SPECS[name]
+    if spec.incremental == 'rows':
+        frame = read_appended_rows(name, old_body, old_frame, body)
+    elif spec.incremental == 'columns':
+        frame = read_appended_columns(name, old_body, old_frame, body)
+    else:
+        frame = None
+    return read_source(name, body) if frame is None else frame
+
+
+# Offset of the first byte where two downloads differ
+def common_prefix(a, b):
+    n = min(len(a), len(b))
+    mismatch = np.flatnonzero(np.frombuffer(a, np.uint8, n) != np.frombuffer(b, np.uint8, n))
+    return int(mismatch[0]) if len(mismatch) else n
+
+
+# Rows are appended (and the last few days may be revised): keep the old rows up to the first changed
+# line and parse only the lines from there on
+def read_appended_rows(name, old_body, old_frame, body):
+    header_end = body.find(b'\n') + 1
+    cut = body.rfind(b'\n', 0, common_prefix(old_body, body)) + 1
+    if header_end == 0 or cut < header_end:  # header changed
+        return None
+
+    kept = body.count(b'\n', header_end, cut)
+    if kept > len(old_frame):
+        return None
+    if cut == len(body):
+        return old_frame.iloc[:kept]
+
+    tail = read_source(name, body[:header_end] + body[cut:])
+    return pd.concat([old_frame.iloc[:kept], tail], ignore_index=True)
+
+
+# Every row gains trailing date columns: if each new line is exactly the old line plus new fields,
+# parse just those fields and join them onto the old frame
+def read_appended_columns(name, old_body, old_frame, body):
+    old_lines, lines = old_body.splitlines(), body.splitlines()
+    if len(old_lines) != len(lines) or len(old_frame) != len(lines) - 1:
+        return None
+
+    suffixes = []
+    for old, new in zip(old_lines, lines):
+        if new == old:
+            suffixes.append(b'')
+        elif new.startswith(old) and new[len(old):len(old) + 1] == b',':
+            suffixes.append(new[len(old) + 1:])
+        else:
+            return None
+    if not suffixes[0]:
+        return old_frame
+    if not all(suffixes):
+        return None
+
+    spec = INGEST_SPECS[name]
+    added = pd.read_csv(io.BytesIO(b'\n'.join(suffixes)), engine=spec.engine)
+    usecols = spec.usecols(list(added.columns)) if callable(spec.usecols) else spec.usecols
+    if list(added.columns) != [c for c in usecols if c in added.columns]:  # something other than dates was added
+        return None
+    dtype = spec.dtype(list(added.columns)) if callable(spec.dtype) else spec.dtype
+    added = added.astype(dtype)
+    return pd.concat([old_frame, added.set_axis(old_frame.index)], axis=1)
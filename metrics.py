@@ -0,0 +1,180 @@
+# Libraries
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+import pandas as pd
+#############################################################################################################################
+
+logger = logging.getLogger(__name__)
+
+# Pipeline stages, in the order data flows through them
+STAGES = ('fetch', 'parse', 'view', 'figure', 'render')
+
+# How many individual measurements are kept for the admin panel
+HISTORY = 500
+
+# Peak memory per stage needs tracemalloc, which slows allocation-heavy code down noticeably,
+# so it is only switched on when asked for (COVID_DASHBOARD_TRACE_MEMORY=1)
+TRACE_MEMORY = os.environ.get('COVID_DASHBOARD_TRACE_MEMORY') == '1'
+
+# Every measurement is logged as one JSON line on the `metrics` logger. Neither Streamlit nor uvicorn configures
+# that logger, so its lines are written to stderr only when asked for (COVID_DASHBOARD_METRICS_LOG=1).
+if os.environ.get('COVID_DASHBOARD_METRICS_LOG') == '1':
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+# One timed run of a stage. `bytes` and `rows` describe its output; peak_bytes is the most memory
+# allocated above the starting point while it ran (None unless memory tracing is on).
+class Measurement:
+    def __init__(self, stage, name):
+        self.stage = stage
+        self.name = name
+        self.started = time.time()
+        self.seconds = 0.0
+        self.bytes = None
+        self.rows = None
+        self.peak_bytes = None
+        self.error = None
+
+    # Fill in bytes/rows from a stage's output
+    def observe(self, value):
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            self.bytes = len(value)
+        elif isinstance(value, (pd.DataFrame, pd.Series)):
+            self.rows = len(value)
+            self.bytes = int(value.memory_usage(index=True).sum()) if isinstance(value, pd.DataFrame) \
+                else int(value.memory_usage(index=True))
+        elif isinstance(value, dict) and value and all(isinstance(v, pd.DataFrame) for v in value.values()):
+            self.rows = sum(len(v) for v in value.values())
+            self.bytes = sum(int(v.memory_usage(index=True).sum()) for v in value.values())
+        return value
+
+    def as_dict(self):
+        return {'stage': self.stage, 'name': self.name, 'started': self.started, 'seconds': self.seconds,
+                'bytes': self.bytes, 'rows': self.rows, 'peak_bytes': self.peak_bytes, 'error': self.error}
+
+
+# Recent measurements plus running totals per (stage, name), shared by every session in the process
+class Metrics:
+    def __init__(self, history=HISTORY, trace_memory=TRACE_MEMORY):
+        self.trace_memory = trace_memory
+        self._history = deque(maxlen=history)
+        self._totals = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    # Time a block: `with METRICS.measure('parse', name) as m: m.observe(frame)`
+    @contextmanager
+    def measure(self, stage, name):
+        m = Measurement(stage, name)
+        stack = self._local.__dict__.setdefault('stack', [])
+        base = self._start_memory()
+        stack.append(m)
+        start = time.perf_counter()
+        try:
+            yield m
+        except BaseException as error:
+            m.error = type(error).__name__
+            raise
+        finally:
+            m.seconds = time.perf_counter() - start
+            stack.pop()
+            self._end_memory(m, base, stack)
+            self.record(m)
+
+    # tracemalloc keeps a single process-wide peak. Each stage resets it, and on the way out reports its
+    # peak to the enclosing stage so nested stages don't hide each other's peaks (approximate when
+    # several threads are measuring at once).
+    def _start_memory(self):
+        if not self.trace_memory:
+            return None
+        current, peak = tracemalloc.get_traced_memory()
+        stack = self._local.stack
+        if stack:
+            stack[-1].peak_seen = max(getattr(stack[-1], 'peak_seen', 0), peak)
+        tracemalloc.reset_peak()
+        return current
+
+    def _end_memory(self, m, base, stack):
+        if base is None:
+            return
+        peak = max(tracemalloc.get_traced_memory()[1], getattr(m, 'peak_seen', 0))
+        m.peak_bytes = max(peak - base, 0)
+        if stack:
+            stack[-1].peak_seen = max(getattr(stack[-1], 'peak_seen', 0), peak)
+
+    def record(self, m):
+        with self._lock:
+            self._history.append(m)
+            totals = self._totals.setdefault((m.stage, m.name), {'count': 0, 'seconds': 0.0, 'errors': 0})
+            totals['count'] += 1
+            totals['seconds'] += m.seconds
+            totals['errors'] += m.error is not None
+            totals['last'] = m
+        logger.info(json.dumps(m.as_dict()))
+
+    # Recent measurements, newest first
+    def history(self):
+        with self._lock:
+            return [m.as_dict() for m in reversed(self._history)]
+
+    # One row per (stage, name): runs, total and mean seconds, and the output size of the last run
+    def summary(self):
+        with self._lock:
+            rows = [{'stage': stage, 'name': name, 'count': t['count'], 'errors': t['errors'],
+                     'total_seconds': t['seconds'], 'mean_seconds': t['seconds'] / t['count'],
+                     'last_seconds': t['last'].seconds, 'bytes': t['last'].bytes, 'rows': t['last'].rows,
+                     'peak_bytes': t['last'].peak_bytes}
+                    for (stage, name), t in self._totals.items()]
+        order = {stage: i for i, stage in enumerate(STAGES)}
+        return sorted(rows, key=lambda row: (order.get(row['stage'], len(order)), -row['total_seconds']))
+
+    # Prometheus text exposition format
+    def prometheus(self, prefix='covid_dashboard_stage'):
+        lines = [f'# HELP {prefix}_seconds Wall time spent in a pipeline stage.',
+                 f'# TYPE {prefix}_seconds summary']
+        gauges = []
+        for row in self.summary():
+            labels = f'stage="{row["stage"]}",name="{row["name"]}"'
+            lines.append(f'{prefix}_seconds_sum{{{labels}}} {row["total_seconds"]:.6f}')
+            lines.append(f'{prefix}_seconds_count{{{labels}}} {row["count"]}')
+            for field in ('errors', 'bytes', 'rows', 'peak_bytes'):
+                if row[field] is not None:
+                    gauges.append((field, labels, row[field]))
+        for field in ('errors', 'bytes', 'rows', 'peak_bytes'):
+            kind = 'counter' if field == 'errors' else 'gauge'
+            name = f'{prefix}_{field}_total' if field == 'errors' else f'{prefix}_last_{field}'
+            lines += [f'# TYPE {name} {kind}']
+            lines += [f'{name}{{{labels}}} {value}' for f, labels, value in gauges if f == field]
+        return '\n'.join(lines) + '\n'
+
+
+METRICS = Metrics()
+
+
+def measure(stage, name):
+    return METRICS.measure(stage, name)
+
+
+# Decorator timing every call of a function as one stage; the return value's size is recorded too
+def measured(stage, name=None):
+    def decorate(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with measure(stage, name or function.__name__) as m:
+                return m.observe(function(*args, **kwargs))
+        return wrapper
+    return decorate
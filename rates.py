@@ -0,0 +1,59 @@
+# Libraries
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+#############################################################################################################################
+
+# Rates are expressed per this many people
+PERCENT = 100
+PER_100K = 100_000
+PER_MILLION = 1_000_000
+
+
+# One geography level's populations and counts as NumPy arrays aligned on sorted integer region ids.
+# rates maps each rate column to (count it is computed from, per how many people).
+@dataclass(frozen=True)
+class RegionCounts:
+    level: str
+    ids: np.ndarray
+    population: np.ndarray
+    counts: dict
+    rates: dict
+
+    # Every rate of the level at once: a (rates x regions) block of counts divided by the population row.
+    # Regions without a population (or with none) get NaN rates.
+    def compute(self):
+        names = list(self.rates)
+        numerators = np.vstack([self.counts[count] for count, per in self.rates.values()]).astype(np.float64)
+        per = np.array([per for count, per in self.rates.values()], dtype=np.float64)[:, None]
+        population = np.where(self.population > 0, self.population, np.nan)
+        values = numerators * per / population
+
+        frame = pd.DataFrame({'population': self.population, **self.counts},
+                             index=pd.Index(self.ids, name=self.level))
+        for name, row in zip(names, values):
+            frame[name] = row
+        return frame
+
+
+# A source's values placed on the level's ids by binary search: NaN where the source has no row for a
+# region, and rows for regions outside the level dropped
+def align(ids, source_ids, values):
+    source_ids = np.asarray(source_ids)
+    values = np.asarray(values, dtype=np.float64)
+    aligned = np.full(len(ids), np.nan)
+    if not len(ids) or not len(source_ids):
+        return aligned
+    pos = np.minimum(np.searchsorted(ids, source_ids), len(ids) - 1)
+    hit = ids[pos] == source_ids
+    aligned[pos[hit]] = values[hit]
+    return aligned
+
+
+# RegionCounts for a level from per-source (ids, values) pairs: population=(ids, values),
+# counts={name: (ids, values)}
+def region_counts(level, ids, population, counts, rates):
+    ids = np.unique(np.asarray(ids, dtype=np.int64))
+    return RegionCounts(level, ids, align(ids, *population),
+                        {name: align(ids, *pair) for name, pair in counts.items()}, rates)
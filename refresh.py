@@ -0,0 +1,75 @@
+# Libraries
+import logging
+import threading
+#############################################################################################################################
+
+logger = logging.getLogger(__name__)
+
+# How often sources are revalidated in the background (seconds)
+REFRESH_INTERVAL = 60*60*1
+
+
+# Stale-while-revalidate: pages always read the last good set of downloads, while a daemon thread
+# re-fetches sources on its own schedule and swaps the new set in as a whole once it is complete.
+# Sources are downloaded the first time a page asks for them, and only those are kept fresh, so a
+# session that never opens a section never pays for its data. After a restart, a source with a snapshot on
+# disk (from `cached`) is served from it at once and revalidated in the background.
+class Refresher:
+    def __init__(self, fetch, interval=REFRESH_INTERVAL, on_refresh=None, cached=None):
+        self.fetch = fetch
+        self.interval = interval
+        self.on_refresh = on_refresh
+        self.cached = cached
+        self._results = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # Downloads for the given sources (fetching any not seen yet); with no names, whatever is loaded so far
+    def current(self, names=()):
+        missing = [name for name in names if name not in self._results]
+        if missing and self.cached is not None:
+            on_disk = self.cached(missing)
+            if on_disk:
+                self._merge(on_disk)
+                threading.Thread(target=self.revalidate, args=(list(on_disk),),
+                                 name='source-revalidate', daemon=True).start()
+            missing = [name for name in missing if name not in on_disk]
+        if missing:
+            self._merge(self.fetch(names=missing))
+        return self._results
+
+    # A single reference swap, so readers see either the old or the new set
+    def _merge(self, results):
+        with self._lock:
+            self._results = {**self._results, **results}
+
+    def refresh(self):
+        if self._results:
+            self.revalidate(list(self._results))
+
+    # Re-fetch some sources; any that fail keep the snapshot they have
+    def revalidate(self, names):
+        try:
+            self._merge(self.fetch(names=names, previous=self._results))
+        except Exception:
+            logger.exception('revalidating %s failed, keeping the last good data', ', '.join(names))
+            return
+        if self.on_refresh is not None:
+            self.on_refresh()
+
+    # Nothing is fetched up front: the page's first request for a source downloads it
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='source-refresher', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception('background refresh failed, keeping the last good data')
@@ -0,0 +1,94 @@
+# Libraries
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+#############################################################################################################################
+
+# Integer ids for the regions the dashboard plots, so sources are joined on numbers rather than names
+
+# US states, DC and the territories on the national charts: FIPS code -> (postal code, name).
+# American Samoa and the Northern Mariana Islands are left out, as they always have been on these charts.
+STATES = {
+    1: ('AL', 'Alabama'), 2: ('AK', 'Alaska'), 4: ('AZ', 'Arizona'), 5: ('AR', 'Arkansas'),
+    6: ('CA', 'California'), 8: ('CO', 'Colorado'), 9: ('CT', 'Connecticut'), 10: ('DE', 'Delaware'),
+    11: ('DC', 'District of Columbia'), 12: ('FL', 'Florida'), 13: ('GA', 'Georgia'), 15: ('HI', 'Hawaii'),
+    16: ('ID', 'Idaho'), 17: ('IL', 'Illinois'), 18: ('IN', 'Indiana'), 19: ('IA', 'Iowa'),
+    20: ('KS', 'Kansas'), 21: ('KY', 'Kentucky'), 22: ('LA', 'Louisiana'), 23: ('ME', 'Maine'),
+    24: ('MD', 'Maryland'), 25: ('MA', 'Massachusetts'), 26: ('MI', 'Michigan'), 27: ('MN', 'Minnesota'),
+    28: ('MS', 'Mississippi'), 29: ('MO', 'Missouri'), 30: ('MT', 'Montana'), 31: ('NE', 'Nebraska'),
+    32: ('NV', 'Nevada'), 33: ('NH', 'New Hampshire'), 34: ('NJ', 'New Jersey'), 35: ('NM', 'New Mexico'),
+    36: ('NY', 'New York'), 37: ('NC', 'North Carolina'), 38: ('ND', 'North Dakota'), 39: ('OH', 'Ohio'),
+    40: ('OK', 'Oklahoma'), 41: ('OR', 'Oregon'), 42: ('PA', 'Pennsylvania'), 44: ('RI', 'Rhode Island'),
+    45: ('SC', 'South Carolina'), 46: ('SD', 'South Dakota'), 47: ('TN', 'Tennessee'), 48: ('TX', 'Texas'),
+    49: ('UT', 'Utah'), 50: ('VT', 'Vermont'), 51: ('VA', 'Virginia'), 53: ('WA', 'Washington'),
+    54: ('WV', 'West Virginia'), 55: ('WI', 'Wisconsin'), 56: ('WY', 'Wyoming'),
+    66: ('GU', 'Guam'), 72: ('PR', 'Puerto Rico'), 78: ('VI', 'Virgin Islands'),
+}
+
+# NYC boroughs by borough code, as used in NYC's own datasets, with their county names
+BOROUGHS = {1: ('New York', 'Manhattan'), 2: ('Bronx', 'Bronx'), 3: ('Kings', 'Brooklyn'),
+            4: ('Queens', 'Queens'), 5: ('Richmond', 'Staten Island')}
+
+
+# Names are spelled differently across sources ('StatenIsland', 'Staten Island', 'Brooklyn (Kings County)'):
+# they are matched on their letters and digits only, ignoring case and anything in parentheses
+def name_key(name):
+    name = re.sub(r'\(.*?\)', '', str(name))
+    return ''.join(ch for ch in name.lower() if ch.isalnum())
+
+
+# The regions of one geography level: sorted integer ids, their display names (and short codes, if any),
+# and every name or code a source may use for them. Sources are mapped to ids per distinct value (a
+# categorical's categories), and the mapping for a given set of values is cached, so a rerun never compares
+# strings row by row again.
+class RegionLevel:
+    def __init__(self, name, regions, aliases=None, codes=None):
+        self.name = name
+        self.ids = np.array(sorted(regions), dtype=np.int64)
+        self.names = pd.Index([regions[i] for i in self.ids])
+        self.codes = pd.Index([codes[i] for i in self.ids]) if codes else None
+        names = {region: [regions[region]] + ([codes[region]] if codes else []) + (aliases or {}).get(region, [])
+                 for region in regions}
+        self.aliases = {name_key(alias): region for region, known in names.items() for alias in known}
+        self._lookup = lru_cache(maxsize=32)(self._category_ids)
+
+    def _category_ids(self, categories):
+        return np.array([self.aliases.get(name_key(c), -1) for c in categories], dtype=np.int64)
+
+    # Region ids for a column of names or codes; -1 where a value isn't a region of this level
+    def ids_for(self, values):
+        values = pd.Series(values)
+        categorical = values.cat if isinstance(values.dtype, pd.CategoricalDtype) else values.astype('category').cat
+        ids = self._lookup(tuple(categorical.categories))
+        codes = categorical.codes.to_numpy()
+        return np.where(codes >= 0, ids[codes], -1)
+
+    # Names (or short codes) of ids of this level, as a categorical
+    def categorical(self, ids, codes=False):
+        return pd.Categorical.from_codes(np.searchsorted(self.ids, ids),
+                                         categories=self.codes if codes else self.names)
+
+
+STATE_REGIONS = RegionLevel('fips', {fips: name for fips, (postal, name) in STATES.items()},
+                            aliases={78: ['U.S. Virgin Islands']},
+                            codes={fips: postal for fips, (postal, name) in STATES.items()})
+
+BOROUGH_REGIONS = RegionLevel('borough', {code: name for code, (county, name) in BOROUGHS.items()},
+                              aliases={code: [county, f'{county} County'] for code, (county, name) in BOROUGHS.items()})
+
+
+# MODZCTA codes are zip codes: their integer value is the id
+def modzcta_ids(values):
+    return pd.to_numeric(pd.Series(values), errors='coerce').fillna(-1).to_numpy(dtype=np.int64)
+
+
+# ISO 3166-1 alpha-3 codes (and OWID's OWID_* aggregates) as int64: the code's ASCII bytes, big-endian
+def iso_ids(codes):
+    padded = np.asarray(codes, dtype='S8')
+    return padded.view('>u8').astype(np.int64) if len(padded) else np.array([], dtype=np.int64)
+
+
+def iso_codes(ids):
+    return np.asarray(ids, dtype='>u8').view('S8').astype(str)
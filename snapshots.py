@@ -0,0 +1,64 @@
+# Libraries
+import logging
+import os
+import tempfile
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from sources import CACHE_DIR
+#############################################################################################################################
+
+logger = logging.getLogger(__name__)
+
+
+# Parsed, typed frames stored as uncompressed Arrow IPC files so they can be memory-mapped back without parsing.
+# A snapshot is tied to the version (content digest) of the download it was parsed from.
+class SnapshotStore:
+    def __init__(self, root=Path(CACHE_DIR) / 'frames'):
+        self.root = Path(root)
+
+    def path(self, name, version):
+        return self.root / f'{name}-{version}.arrow'
+
+    def read(self, name, version):
+        path = self.path(name, version)
+        if not path.exists():
+            return None
+        return feather.read_table(path, memory_map=True).to_pandas()
+
+    def write(self, name, version, frame):
+        self.root.mkdir(parents=True, exist_ok=True)
+        path = self.path(name, version)
+        fd, tmp = tempfile.mkstemp(dir=self.root, prefix=path.name, suffix='.tmp')
+        os.close(fd)
+        try:
+            feather.write_feather(frame, tmp, compression='uncompressed')
+            os.replace(tmp, path)
+        except (pa.ArrowException, ValueError, TypeError) as error:
+            os.unlink(tmp)
+            logger.warning('could not snapshot %s: %s', name, error)
+            return
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+        # Older versions of the same frame are never read again
+        for old in self.root.glob(f'{name}-*.arrow'):
+            if old != path:
+                old.unlink(missing_ok=True)
+
+    # Read a frame from its snapshot, or parse it and write the snapshot for the next (warm) start
+    def load(self, name, version, parse):
+        frame = self.read(name, version)
+        if frame is not None:
+            logger.info('loaded %s from snapshot %s', name, version)
+            return frame
+
+        frame = parse()
+        self.write(name, version, frame)
+        return frame
+
+
+SNAPSHOTS = SnapshotStore()
@@ -0,0 +1,407 @@
+# Libraries
+import hashlib
+import io
+import json
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
+from functools import partial
+from pathlib import Path
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+from cache_backend import SingleFlight
+from metrics import measure
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to unlocked (still atomic) cache writes
+    fcntl = None
+#############################################################################################################################
+
+logger = logging.getLogger(__name__)
+
+# Read size used while streaming a download; the deadline is checked between reads
+CHUNK_SIZE = 1 << 16
+
+# On-disk download cache shared by every worker process on the host
+CACHE_DIR = Path(os.environ.get('COVID_DASHBOARD_CACHE', Path(__file__).parent / '.cache'))
+
+# A snapshot revalidated less than this many seconds ago is reused without asking upstream again
+FRESH_FOR = 60
+
+
+@dataclass(frozen=True)
+class Source:
+    url: str
+    timeout: float = 30  # seconds allowed for the whole download, not just the connect
+    keep_previous: bool = False  # keep the prior snapshot on disk so append-only feeds can be parsed incrementally
+    streamed: bool = False  # written to the disk cache as it arrives and parsed from there, never held whole
+
+
+@dataclass
+class FetchResult:
+    name: str
+    body: bytes
+    seconds: float
+    status: str = 'downloaded'  # 'downloaded', 'not-modified' (304), 'fresh' (recently revalidated), 'shared' (copied from
+                                # another replica's download), 'cached' (read from disk, not revalidated yet) or
+                                # 'stale' (revalidation failed; the last good snapshot is served)
+    version: str = ''  # content digest, identifies the snapshot parsed frames are derived from
+    previous_version: str = ''  # version of the snapshot this one replaced (only for keep_previous sources)
+    path: Path = None  # snapshot on disk, for streamed sources (their body is None)
+
+    @property
+    def size(self):
+        return len(self.body) if self.body is not None else self.path.stat().st_size
+
+    # The downloaded bytes as a binary file object: the snapshot on disk for streamed sources
+    def open(self):
+        return io.BytesIO(self.body) if self.body is not None else open(self.path, 'rb')
+
+
+# Live Datasets that are regularly updated
+SOURCES = {
+    'us_states': Source('https://github.com/nytimes/covid-19-data/blob/master/live/us-states.csv?raw=true'),
+    'vaccines': Source('https://github.com/BloombergGraphics/covid-vaccine-tracker-data/blob/master/data/current-usa.csv?raw=true'),
+    'jhu_confirmed': Source('https://github.com/CSSEGISandData/COVID-19/blob/master/csse_covid_19_data/csse_covid_19_time_series/time_series_covid19_confirmed_US.csv?raw=true', timeout=90, keep_previous=True),
+    'boro_totals': Source('https://github.com/nychealth/coronavirus-data/blob/master/totals/by-group.csv?raw=true'),
+    'data_by_day': Source('https://github.com/nychealth/coronavirus-data/blob/master/trends/data-by-day.csv?raw=true', keep_previous=True),
+    'modzcta_totals': Source('https://github.com/nychealth/coronavirus-data/blob/master/totals/data-by-modzcta.csv?raw=true'),
+    'modzcta_caserate': Source('https://github.com/nychealth/coronavirus-data/blob/master/trends/caserate-by-modzcta.csv?raw=true', keep_previous=True),
+    'owid': Source('https://github.com/owid/covid-19-data/blob/master/public/data/owid-covid-data.csv?raw=true', timeout=120, streamed=True),
+    # MODZCTA geometry and attributes (modzcta, label, zcta, pop_est) come from this one download
+    'modzcta_geojson': Source('https://data.cityofnewyork.us/resource/pri4-ifjk.geojson'),
+    'boro_pop': Source('https://www.citypopulation.de/en/usa/newyorkcity/'),
+}
+
+#############################################################################################################################
+
+# Disk-backed snapshots keyed by URL, stored next to the validators (ETag / Last-Modified) they came with
+class DiskCache:
+    def __init__(self, root=CACHE_DIR):
+        self.root = Path(root)
+
+    def _path(self, url, suffix):
+        return self.root / (hashlib.sha256(url.encode()).hexdigest()[:32] + suffix)
+
+    def load(self, url):
+        try:
+            meta = json.loads(self._path(url, '.json').read_text())
+            body = self._path(url, '.body').read_bytes()
+        except (OSError, ValueError):
+            return None, {}
+        return body, meta
+
+    def load_meta(self, url):
+        try:
+            return json.loads(self._path(url, '.json').read_text())
+        except (OSError, ValueError):
+            return {}
+
+    # Streamed snapshots are stored under their version, so a result always reads the bytes it was versioned
+    # from, even after a newer download has landed
+    def stream_path(self, url, version):
+        return self._path(url, f'-{version}.body')
+
+    def load_previous(self, url):
+        try:
+            return self._path(url, '.prev').read_bytes()
+        except OSError:
+            return None
+
+    def store(self, url, body, meta, keep_previous=False):
+        self.root.mkdir(parents=True, exist_ok=True)
+        if body is not None:
+            if keep_previous and self._path(url, '.body').exists():
+                os.replace(self._path(url, '.body'), self._path(url, '.prev'))
+            self._replace(self._path(url, '.body'), body)
+        self._replace(self._path(url, '.json'), json.dumps(dict(meta, url=url)).encode())
+
+    # Write to a temporary file and rename so readers in other processes never see a partial snapshot
+    def _replace(self, path, data):
+        fd, tmp = tempfile.mkstemp(dir=self.root, prefix=path.name, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    # Write a streamed download chunk by chunk, hashing it as it arrives; it appears under its version only once
+    # complete. Returns the version.
+    def store_stream(self, url, chunks):
+        self.root.mkdir(parents=True, exist_ok=True)
+        hasher = hashlib.blake2b(digest_size=12)
+        fd, tmp = tempfile.mkstemp(dir=self.root, prefix=self._path(url, '').name, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in chunks:
+                    hasher.update(chunk)
+                    f.write(chunk)
+            os.replace(tmp, self.stream_path(url, hasher.hexdigest()))
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        return hasher.hexdigest()
+
+    # Remove a URL's streamed snapshots other than the given versions
+    def prune_streams(self, url, keep):
+        prefix = self._path(url, '-').name
+        for path in self.root.glob(prefix + '*.body'):
+            if path.name[len(prefix):-len('.body')] not in keep:
+                path.unlink(missing_ok=True)
+
+    # One process revalidates a URL at a time; the rest wait and then reuse its fresh snapshot
+    @contextmanager
+    def lock(self, url):
+        if fcntl is None:
+            yield
+            return
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self._path(url, '.lock'), 'wb') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+DISK_CACHE = DiskCache()
+
+
+# Conditional request headers for a cached snapshot
+def validators(meta):
+    headers = {}
+    if meta.get('etag'):
+        headers['If-None-Match'] = meta['etag']
+    if meta.get('last_modified'):
+        headers['If-Modified-Since'] = meta['last_modified']
+    return headers
+
+
+def digest(body):
+    return hashlib.blake2b(body, digest_size=12).hexdigest()
+
+
+# Stream a response body chunk by chunk, giving up once the source's deadline has passed
+def read_chunks(name, response, source, start):
+    while True:
+        chunk = response.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        yield chunk
+        if time.perf_counter() - start > source.timeout:
+            raise TimeoutError(f'{name}: download took longer than {source.timeout}s')
+
+
+def read_body(name, response, source, start):
+    return b''.join(read_chunks(name, response, source, start))
+
+
+# Concurrent fetches of the same URL (e.g. the background refresher and an API request) share one download
+FLIGHTS = SingleFlight()
+
+
+# Download a single source, revalidating against the disk cache so an unchanged feed costs only a 304.
+# With a cache backend shared by replicas, one replica revalidates it for all of them.
+def fetch(name, source, cache=DISK_CACHE, shared=None):
+    if source.streamed and cache is not None:
+        fetcher = _fetch_streamed
+    elif shared is not None and cache is not None:
+        fetcher = partial(_fetch_shared, shared=shared)
+    else:
+        fetcher = _fetch
+    return FLIGHTS.do(source.url, lambda: _measured_fetch(name, source, cache, fetcher))
+
+
+def _measured_fetch(name, source, cache, fetcher):
+    with measure('fetch', name) as m:
+        result = fetcher(name, source, cache)
+        m.bytes = result.size
+        return result
+
+
+def _fetch(name, source, cache):
+    start = time.perf_counter()
+    if cache is None:
+        with urlopen(source.url, timeout=source.timeout) as response:
+            body = read_body(name, response, source, start)
+        return _fetched(FetchResult(name, body, time.perf_counter() - start, version=digest(body)))
+
+    with cache.lock(source.url):
+        body, meta = cache.load(source.url)
+        if body is not None and time.time() - meta.get('checked_at', 0) < FRESH_FOR:
+            return _fetched(FetchResult(name, body, time.perf_counter() - start, 'fresh',
+                                        meta.get('version') or digest(body), meta.get('previous_version', '')))
+
+        request = Request(source.url, headers=validators(meta) if body is not None else {})
+        try:
+            with urlopen(request, timeout=source.timeout) as response:
+                new_body = read_body(name, response, source, start)
+                previous_version = meta.get('version', '') if body is not None and source.keep_previous else ''
+                meta = {'etag': response.headers.get('ETag'),
+                        'last_modified': response.headers.get('Last-Modified'),
+                        'version': digest(new_body),
+                        'previous_version': previous_version}
+            status, body = 'downloaded', new_body
+        except OSError as error:  # URLError, HTTPError (including 304) and timeouts
+            if body is None:
+                raise
+            if not not_modified(error):
+                return _stale(name, error, FetchResult(name, body, time.perf_counter() - start, 'stale',
+                                                       meta.get('version') or digest(body),
+                                                       meta.get('previous_version', '')))
+            status, new_body = 'not-modified', None
+            meta.setdefault('version', digest(body))
+
+        meta['checked_at'] = time.time()
+        cache.store(source.url, new_body, meta, source.keep_previous)
+        return _fetched(FetchResult(name, body, time.perf_counter() - start, status,
+                                    meta['version'], meta.get('previous_version', '')))
+
+
+class _Unpublished(Exception):
+    pass
+
+
+# Replicas sharing a cache backend revalidate a source upstream once per FRESH_FOR window between them: the
+# first one fetches it and publishes the body with its validators under the window's lease, the others copy
+# that snapshot into their own disk cache. Streamed sources are left out: they are never held in memory to publish.
+def _fetch_shared(name, source, cache, shared):
+    if time.time() - cache.load_meta(source.url).get('checked_at', 0) < FRESH_FOR:
+        return _fetch(name, source, cache)
+    start = time.perf_counter()
+    own = []
+
+    def download():
+        own.append(_fetch(name, source, cache))
+        if own[0].status == 'stale':  # not published: other replicas try upstream themselves
+            raise _Unpublished
+        return own[0].body, cache.load_meta(source.url)
+
+    window = int(time.time() // FRESH_FOR)
+    try:
+        body, meta = shared.get_or_compute(f'download:{source.url}:{window}', download, 2 * FRESH_FOR)
+    except _Unpublished:
+        return own[0]
+    if own:
+        return own[0]
+
+    with cache.lock(source.url):
+        local = cache.load_meta(source.url)
+        changed = local.get('version') != meta['version']
+        if changed:
+            meta = dict(meta, previous_version=local.get('version', '') if source.keep_previous else '')
+        else:
+            meta = local
+        meta['checked_at'] = time.time()
+        cache.store(source.url, body if changed else None, meta, source.keep_previous)
+    return _fetched(FetchResult(name, body, time.perf_counter() - start, 'shared',
+                                meta['version'], meta.get('previous_version', '')))
+
+
+# Large feeds go straight from the response to the disk cache, hashed as they arrive, so memory use does not
+# grow with the download; the result points at the snapshot file instead of carrying its bytes. The snapshot
+# it replaced is kept until the next download, for parses of it still in flight.
+def _fetch_streamed(name, source, cache):
+    start = time.perf_counter()
+    with cache.lock(source.url):
+        meta = cache.load_meta(source.url)
+        if not meta.get('version') or not cache.stream_path(source.url, meta['version']).exists():
+            meta = {}
+        if meta and time.time() - meta.get('checked_at', 0) < FRESH_FOR:
+            return _fetched(FetchResult(name, None, time.perf_counter() - start, 'fresh', meta['version'],
+                                        path=cache.stream_path(source.url, meta['version'])))
+
+        request = Request(source.url, headers=validators(meta))
+        try:
+            with urlopen(request, timeout=source.timeout) as response:
+                version = cache.store_stream(source.url, read_chunks(name, response, source, start))
+                meta = {'etag': response.headers.get('ETag'),
+                        'last_modified': response.headers.get('Last-Modified'),
+                        'version': version,
+                        'previous_version': meta.get('version', '')}
+            status = 'downloaded'
+        except OSError as error:
+            if not meta:
+                raise
+            if not not_modified(error):
+                return _stale(name, error, FetchResult(name, None, time.perf_counter() - start, 'stale',
+                                                       meta['version'], path=cache.stream_path(source.url, meta['version'])))
+            status = 'not-modified'
+
+        meta['checked_at'] = time.time()
+        cache.store(source.url, None, meta)
+        cache.prune_streams(source.url, keep={meta['version'], meta.get('previous_version', '')})
+        return _fetched(FetchResult(name, None, time.perf_counter() - start, status, meta['version'],
+                                    path=cache.stream_path(source.url, meta['version'])))
+
+
+def not_modified(error):
+    return isinstance(error, HTTPError) and error.code == 304
+
+
+# Upstream failed but a good snapshot is on disk: serve it, and try again on the next refresh
+def _stale(name, error, result):
+    logger.warning('%s: revalidation failed (%s), serving the snapshot on disk', name, error)
+    return _fetched(result)
+
+
+def _fetched(result):
+    logger.info('fetched %s (%s): %d bytes in %.2fs', result.name, result.status, result.size, result.seconds)
+    return result
+
+
+# Snapshots already on disk, served as they are (status 'cached') so a restarted process answers its first
+# requests without waiting on upstream; sources without one are left out
+def load_cached(names, sources=SOURCES, cache=DISK_CACHE):
+    results = {}
+    for name in names:
+        source = sources[name]
+        if source.streamed:
+            meta = cache.load_meta(source.url)
+            path = cache.stream_path(source.url, meta['version']) if meta.get('version') else None
+            if path is not None and path.exists():
+                results[name] = FetchResult(name, None, 0.0, 'cached', meta['version'], path=path)
+            continue
+        body, meta = cache.load(source.url)
+        if body is not None:
+            results[name] = FetchResult(name, body, 0.0, 'cached', meta.get('version') or digest(body),
+                                        meta.get('previous_version', ''))
+    return results
+
+
+# Download every source at once so a cold start waits on the slowest feed, not the sum of all of them.
+# With previous results, a source that fails to refresh keeps its previous (now 'stale') snapshot.
+def fetch_all(names=None, sources=SOURCES, cache=DISK_CACHE, previous=None, shared=None):
+    names = list(sources) if names is None else list(names)
+    start = time.perf_counter()
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=len(names)) as pool:
+        futures = {name: pool.submit(fetch, name, sources[name], cache, shared) for name in names}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception:
+                if not previous or name not in previous:
+                    raise
+                logger.exception('%s: refresh failed, keeping the previous snapshot', name)
+                results[name] = replace(previous[name], status='stale')
+
+    slowest = max(results.values(), key=lambda result: result.seconds)
+    logger.info('fetched %d sources in %.2fs (slowest: %s at %.2fs)',
+                len(results), time.perf_counter() - start, slowest.name, slowest.seconds)
+    return results
+
+
+# Per-source latency, slowest first
+def latency_report(results):
+    return sorted(((result.name, result.status, result.seconds, result.size) for result in results.values()),
+                  key=lambda row: row[2], reverse=True)
@@ -0,0 +1,23 @@
+# Every format of a dataset has the same columns: its named index first, and no column for an unnamed one
+import io
+import json
+
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from api import encode
+from timeseries import state_totals
+
+JHU = pd.DataFrame({'Admin2': ['Albany', 'Alameda'], 'Province_State': ['New York', 'California'],
+                    '1/22/20': [1, 2], '1/23/20': [3, 4]})
+
+
+@pytest.mark.parametrize('frame, columns', [
+    (state_totals(JHU), ['Date', 'California', 'New York']),
+    (pd.DataFrame({'state': ['New York'], 'cases': [1]}), ['state', 'cases']),
+    (pd.DataFrame({'state': ['New York'], 'cases': [1]}, index=[7]), ['state', 'cases']),
+])
+def test_encoded_columns(frame, columns):
+    assert list(json.loads(encode(frame, 'json'))[0]) == columns
+    assert pq.read_table(io.BytesIO(encode(frame, 'parquet'))).column_names == columns
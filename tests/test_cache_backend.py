@@ -0,0 +1,123 @@
+# Concurrent requests for one key must be computed once, in one process and across processes sharing a cache
+import multiprocessing
+import threading
+import time
+
+import pytest
+
+from cache_backend import SingleFlight, SQLiteBackend
+
+CALLERS = 8
+
+
+# Run fn(i) in CALLERS threads started together; returns their results and errors by caller
+def run_together(fn):
+    barrier = threading.Barrier(CALLERS)
+    results, errors = [None] * CALLERS, [None] * CALLERS
+
+    def call(i):
+        barrier.wait()
+        try:
+            results[i] = fn(i)
+        except Exception as error:
+            errors[i] = error
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(CALLERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=30)
+    return results, errors
+
+
+class Counter:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = 0
+
+    def compute(self, value=None):
+        with self.lock:
+            self.calls += 1
+        time.sleep(0.3)
+        return {'value': value, 'rows': list(range(100))}
+
+
+def test_single_flight_computes_once():
+    flight, counter = SingleFlight(), Counter()
+    results, errors = run_together(lambda i: flight.do('frame', counter.compute))
+    assert errors == [None] * CALLERS
+    assert counter.calls == 1
+    assert all(result is results[0] for result in results)
+
+
+def test_single_flight_error_reaches_every_waiter():
+    flight, calls = SingleFlight(), []
+
+    def fail():
+        calls.append(1)
+        time.sleep(0.3)
+        raise ValueError('upstream down')
+
+    results, errors = run_together(lambda i: flight.do('frame', fail))
+    assert len(calls) == 1
+    assert all(isinstance(error, ValueError) for error in errors)
+    # The failed call is forgotten: the next caller computes again
+    assert flight.do('frame', lambda: 'ok') == 'ok'
+
+
+# Each thread has its own backend, like replicas sharing one database file
+def test_sqlite_computes_once_across_threads(tmp_path):
+    counter = Counter()
+    results, errors = run_together(
+        lambda i: SQLiteBackend(tmp_path / 'cache.db').get_or_compute('view:1', counter.compute, ttl=60))
+    assert errors == [None] * CALLERS
+    assert counter.calls == 1
+    assert all(result == results[0] for result in results)
+
+
+def compute_in_process(path, calls):
+    def compute():
+        with open(calls, 'a') as file:
+            file.write('computed\n')
+        time.sleep(0.5)
+        return {'rows': list(range(100))}
+    return SQLiteBackend(path).get_or_compute('view:1', compute, ttl=60)
+
+
+def test_sqlite_computes_once_across_processes(tmp_path):
+    calls = tmp_path / 'calls'
+    with multiprocessing.get_context('spawn').Pool(4) as pool:
+        results = pool.starmap(compute_in_process, [(tmp_path / 'cache.db', calls)] * 4)
+    assert calls.read_text().count('computed') == 1
+    assert all(result == results[0] for result in results)
+
+
+# A holder that died mid-compute leaves its lock behind; once the lease runs out the next caller takes over
+def test_sqlite_expired_lease_is_taken_over(tmp_path):
+    backend = SQLiteBackend(tmp_path / 'cache.db')
+    assert backend.acquire(backend._key('view:1'), 'dead replica', lease=0.5)
+
+    started = time.monotonic()
+    assert backend.get_or_compute('view:1', lambda: 'recomputed', ttl=60) == 'recomputed'
+    assert time.monotonic() - started >= 0.4
+    assert backend.get_or_compute('view:1', lambda: pytest.fail('cached value not used'), ttl=60) == 'recomputed'
+
+
+# A failed compute releases the lock, so a waiting caller computes for itself instead of waiting out the lease
+def test_sqlite_failed_compute_releases_lock(tmp_path):
+    calls = []
+
+    def compute(i):
+        calls.append(i)
+        time.sleep(0.3)
+        if len(calls) == 1:
+            raise ValueError('upstream down')
+        return 'ok'
+
+    started = time.monotonic()
+    results, errors = run_together(
+        lambda i: SQLiteBackend(tmp_path / 'cache.db').get_or_compute('view:1', lambda: compute(i), ttl=60))
+    assert time.monotonic() - started < 10
+    assert sum(isinstance(error, ValueError) for error in errors) == 1
+    assert len(calls) == 2
+    assert results.count('ok') == CALLERS - 1
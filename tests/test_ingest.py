@@ -0,0 +1,75 @@
+# Incremental parses of append-only feeds must equal a full parse of the new download
+import pandas as pd
+import pytest
+
+from ingest import read_incremental, read_source
+
+DAY_COLUMNS = ['date_of_interest', 'ALL_CASE_COUNT_7DAY_AVG', 'BK_ALL_CASE_COUNT_7DAY_AVG', 'BX_ALL_CASE_COUNT_7DAY_AVG',
+               'MN_ALL_CASE_COUNT_7DAY_AVG', 'QN_ALL_CASE_COUNT_7DAY_AVG', 'SI_ALL_CASE_COUNT_7DAY_AVG', 'CASE_COUNT']
+
+
+def data_by_day(days, revised=None):
+    lines = [','.join(DAY_COLUMNS)]
+    for day in range(days):
+        value = 1000 if day == revised else day
+        lines.append(f'{pd.Timestamp("2020-02-29") + pd.Timedelta(days=day):%m/%d/%Y},'
+                     + ','.join(str(value + i) for i in range(len(DAY_COLUMNS) - 1)))
+    return ('\n'.join(lines) + '\n').encode()
+
+
+def jhu(days):
+    dates = pd.date_range('2020-01-22', periods=days)
+    lines = ['UID,Admin2,Province_State,Country_Region,' + ','.join(f'{d.month}/{d.day}/{d:%y}' for d in dates)]
+    for row, (county, state) in enumerate([('Albany', 'New York'), ('Kings', 'New York'), ('Alameda', 'California')]):
+        lines.append(f'{row},{county},{state},US,' + ','.join(str(row * 100 + day) for day in range(days)))
+    return ('\n'.join(lines) + '\n').encode()
+
+
+def assert_incremental(name, old_body, body):
+    incremental = read_incremental(name, old_body, read_source(name, old_body), body)
+    pd.testing.assert_frame_equal(incremental, read_source(name, body))
+
+
+def test_appended_rows():
+    assert_incremental('data_by_day', data_by_day(30), data_by_day(35))
+
+
+def test_unchanged_rows():
+    assert_incremental('data_by_day', data_by_day(30), data_by_day(30))
+
+
+def test_revised_row_mid_file():
+    assert_incremental('data_by_day', data_by_day(30), data_by_day(35, revised=12))
+
+
+@pytest.mark.parametrize('old_newline, new_newline', [(False, True), (True, False), (False, False)])
+def test_missing_trailing_newline(old_newline, new_newline):
+    old_body, body = data_by_day(30), data_by_day(35)
+    assert_incremental('data_by_day', old_body if old_newline else old_body.rstrip(b'\n'),
+                       body if new_newline else body.rstrip(b'\n'))
+
+
+def test_appended_jhu_columns():
+    assert_incremental('jhu_confirmed', jhu(20), jhu(23))
+
+
+def test_unchanged_jhu_columns():
+    assert_incremental('jhu_confirmed', jhu(20), jhu(20))
+
+
+def test_revised_jhu_value_falls_back_to_full_parse():
+    body = jhu(23).replace(b',1,2,3,', b',1,9,3,', 1)
+    assert_incremental('jhu_confirmed', jhu(20), body)
+
+
+# The previous body on disk was rotated by another worker (it is now the new body itself): the incremental
+# path would see no change and return the old frame, so the download must be parsed in full
+def test_rotated_previous_body_is_not_used(monkeypatch):
+    import data
+    from sources import FetchResult, digest
+
+    old_body, body = jhu(20), jhu(23)
+    monkeypatch.setattr(data.SNAPSHOTS, 'read', lambda name, version: read_source('jhu_confirmed', old_body))
+    monkeypatch.setattr(data.DISK_CACHE, 'load_previous', lambda url: body)
+    result = FetchResult('jhu_confirmed', body, 0.0, version=digest(body), previous_version=digest(old_body))
+    pd.testing.assert_frame_equal(data._parse_source('jhu_confirmed', result), read_source('jhu_confirmed', body))
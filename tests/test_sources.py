@@ -0,0 +1,73 @@
+# A source whose upstream fails keeps being served from its last good snapshot on disk
+import threading
+
+import pytest
+
+import sources
+from refresh import Refresher
+from sources import DiskCache, Source, fetch_all, load_cached
+
+
+@pytest.fixture
+def feed(tmp_path, monkeypatch):
+    monkeypatch.setattr(sources, 'FRESH_FOR', 0)
+    path = tmp_path / 'feed.csv'
+    path.write_bytes(b'a,b\n1,2\n')
+    return path, {'feed': Source(path.as_uri())}, DiskCache(tmp_path / 'cache')
+
+
+def test_failed_revalidation_serves_snapshot_on_disk(feed):
+    path, feeds, cache = feed
+    first = fetch_all(['feed'], feeds, cache)['feed']
+    path.unlink()
+    result = fetch_all(['feed'], feeds, cache)['feed']
+    assert result.status == 'stale'
+    assert (result.body, result.version) == (first.body, first.version)
+
+
+def test_failed_download_without_snapshot_raises(feed):
+    path, feeds, cache = feed
+    path.unlink()
+    with pytest.raises(OSError):
+        fetch_all(['feed'], feeds, cache)
+
+
+def test_streamed_source_serves_snapshot_on_disk(feed):
+    path, feeds, cache = feed
+    feeds = {'feed': Source(path.as_uri(), streamed=True)}
+    first = fetch_all(['feed'], feeds, cache)['feed']
+    path.unlink()
+    result = fetch_all(['feed'], feeds, cache)['feed']
+    assert result.status == 'stale' and result.version == first.version
+    with result.open() as f:
+        assert f.read() == b'a,b\n1,2\n'
+
+
+# After a restart, the first request is answered from disk and the download happens in the background
+def test_cold_refresher_serves_disk_snapshot_and_revalidates(feed):
+    path, feeds, cache = feed
+    fetch_all(['feed'], feeds, cache)
+    path.write_bytes(b'a,b\n1,2\n3,4\n')
+
+    refreshed = threading.Event()
+    refresher = Refresher(lambda names, previous=None: fetch_all(names, feeds, cache, previous),
+                          on_refresh=refreshed.set, cached=lambda names: load_cached(names, feeds, cache))
+    assert refresher.current(['feed'])['feed'].status == 'cached'
+    assert refreshed.wait(10)
+    assert refresher.current(['feed'])['feed'].body == b'a,b\n1,2\n3,4\n'
+
+
+# A streamed result keeps reading its own version after a newer download replaced it
+def test_streamed_result_reads_its_own_version(feed):
+    path, feeds, cache = feed
+    feeds = {'feed': Source(path.as_uri(), streamed=True)}
+    first = fetch_all(['feed'], feeds, cache)['feed']
+    path.write_bytes(b'a,b\n5,6\n')
+    second = fetch_all(['feed'], feeds, cache)['feed']
+    assert second.version != first.version and second.path != first.path
+    with first.open() as f:
+        assert f.read() == b'a,b\n1,2\n'
+
+    path.write_bytes(b'a,b\n7,8\n')
+    fetch_all(['feed'], feeds, cache)
+    assert not first.path.exists() and second.path.exists()
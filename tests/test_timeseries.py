@@ -0,0 +1,60 @@
+# The explorer's case matrix must agree with the per-state totals, including for repeated county names, and
+# rolled-up time ranges with the daily rows they summarize
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from timeseries import (CaseMatrix, RESOLUTIONS, build_rollups, lttb, point_budget, query_range, query_resolution,
+                        state_totals)
+
+
+def jhu():
+    dates = [f'1/{day}/20' for day in range(22, 32)]
+    rows = [('Albany', 'New York'), ('Unassigned', 'New York'), ('Unassigned', 'New York'), ('Alameda', 'California')]
+    frame = pd.DataFrame(rows, columns=['Admin2', 'Province_State'])
+    values = np.cumsum(np.arange(len(rows) * len(dates)).reshape(len(rows), len(dates)) % 7, axis=1)
+    return pd.concat([frame, pd.DataFrame(values, columns=dates)], axis=1)
+
+
+def test_states_match_state_totals():
+    matrix = CaseMatrix.from_jhu(jhu())
+    totals = state_totals(jhu())
+    series = matrix.series(list(totals.columns))
+    pd.testing.assert_frame_equal(series, totals.astype(np.int64), check_names=False, check_freq=False)
+
+
+def test_repeated_county_labels_are_distinct():
+    matrix = CaseMatrix.from_jhu(jhu())
+    assert matrix.counties.is_unique
+    series = matrix.series(counties=['Unassigned, New York', 'Unassigned, New York (2)'], measure='daily')
+    assert list(series.columns) == ['Unassigned, New York', 'Unassigned, New York (2)']
+    assert not series.iloc[:, 0].equals(series.iloc[:, 1])
+
+
+# Rolled-up ranges must cover exactly the days in [start, end], however the range cuts the weeks and months
+@pytest.mark.parametrize('start, end', [(None, None), ('2021-01-01', '2023-03-15'), ('2020-03-04', '2022-12-31'),
+                                        ('2020-06-07', '2022-06-05')])
+@pytest.mark.parametrize('width', [400, 100])
+def test_query_resolution_edges(start, end, width):
+    dates = pd.date_range('2020-02-29', '2023-03-20')
+    daily = pd.DataFrame({'cases': np.arange(len(dates)) % 97 + np.arange(len(dates))}, index=dates)
+    frame, resolution = query_resolution(daily, build_rollups(daily), start, end, 'max', width)
+    window = query_range(daily, start, end)
+    rule = RESOLUTIONS[resolution][0]
+    expected = window.resample(rule).max()
+    pd.testing.assert_frame_equal(frame, expected.set_axis(list(expected.index[:-1]) + [window.index[-1]]),
+                                  check_freq=False)
+    assert resolution != 'daily' and len(frame) <= point_budget(width)
+
+
+# Gaps in a series (days with no value) must not break downsampling
+def test_lttb_all_gap_bucket():
+    y = np.arange(1000, dtype=np.float64)
+    y[400:600] = np.nan
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        x, kept = lttb(np.arange(1000), y, 50)
+    assert len(kept) == 50 and x[0] == 0 and x[-1] == 999
+    assert np.isfinite(kept).sum() >= 40
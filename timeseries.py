@@ -0,0 +1,274 @@
+# Libraries
+from dataclasses import dataclass
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from ingest import JHU_DATE
+#############################################################################################################################
+
+# JHU date headers ('1/22/20') parsed once per distinct header
+@lru_cache(maxsize=4)
+def _parse_jhu_dates(columns):
+    return pd.to_datetime(pd.Index(columns), format='%m/%d/%y')
+
+
+def jhu_date_columns(jhu):
+    return [c for c in jhu.columns if JHU_DATE.match(c)]
+
+
+def jhu_dates(jhu):
+    return _parse_jhu_dates(tuple(jhu_date_columns(jhu)))
+
+
+# Confirmed cases summed over counties for the given states (all states if None): a frame indexed by
+# Date (ascending) with one column per state. Only the matching rows are aggregated, and only the date
+# columns, as one numpy block.
+def state_totals(jhu, states=None):
+    rows = jhu if states is None else jhu[jhu['Province_State'].isin(states)]
+    state = rows['Province_State'].astype('category').cat.remove_unused_categories()
+    values = rows[jhu_date_columns(jhu)].to_numpy(dtype=np.int64)
+
+    order = np.argsort(state.cat.codes.to_numpy(), kind='stable')
+    codes = state.cat.codes.to_numpy()[order]
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]]) if len(codes) else np.array([], dtype=int)
+    totals = np.add.reduceat(values[order], starts, axis=0) if len(starts) else np.empty((0, values.shape[1]))
+
+    names = state.cat.categories[codes[starts]] if len(starts) else []
+    return pd.DataFrame(totals.T, index=jhu_dates(jhu).rename('Date'), columns=pd.Index(names, name='Province_State'))
+
+
+# Long form of state_totals: one row per (state, date)
+def state_totals_long(jhu, states=None):
+    totals = state_totals(jhu, states)
+    return totals.reset_index().melt(id_vars='Date', var_name='state', value_name='cases')
+
+#############################################################################################################################
+
+# Explorer measures: label -> how the cumulative counts are turned into the plotted values
+MEASURES = {
+    'Cumulative':'cumulative',
+    'Daily new':'daily',
+    'Daily new (7-day average)':'daily_avg7'
+}
+
+
+# The JHU county file held once as a regions x dates int32 array, with rows grouped by state so a state's
+# counties are one contiguous block. Selections slice this array; nothing is regrouped or transposed per selection.
+# The array is shared by every session, so it is read-only.
+@dataclass(frozen=True)
+class CaseMatrix:
+    values: np.ndarray      # cumulative confirmed cases, one row per county (or state-level) line
+    dates: pd.DatetimeIndex
+    states: pd.Index        # state names, in row-block order
+    starts: np.ndarray      # first row of each state's block
+    counties: pd.Index      # 'County, State' label of every row
+
+    @classmethod
+    def from_jhu(cls, jhu):
+        state = jhu['Province_State'].astype('category').cat.remove_unused_categories()
+        order = np.argsort(state.cat.codes.to_numpy(), kind='stable')
+        codes = state.cat.codes.to_numpy()[order]
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]]) if len(codes) else np.array([], dtype=int)
+
+        counties = jhu['Admin2'].astype(str).to_numpy()[order] + ', ' + state.astype(str).to_numpy()[order]
+        values = jhu[jhu_date_columns(jhu)].to_numpy(dtype=np.int32)[order]
+        values.setflags(write=False)
+        return cls(values, jhu_dates(jhu), pd.Index(state.cat.categories[codes[starts]]), starts,
+                   unique_labels(counties))
+
+    # Cumulative cases of whole states (summed over their block of rows) and of single counties, one row each
+    def cumulative(self, states=(), counties=()):
+        ends = np.r_[self.starts[1:], len(self.values)]
+        rows = []
+        for state in states:
+            i = self.states.get_loc(state)
+            rows.append(self.values[self.starts[i]:ends[i]].sum(axis=0, dtype=np.int64))
+        positions = self.counties.get_indexer(list(counties))
+        block = np.vstack(rows + [self.values[positions[positions >= 0]].astype(np.int64)]) \
+            if rows or len(counties) else np.empty((0, len(self.dates)), dtype=np.int64)
+        return block, list(states) + list(self.counties[positions[positions >= 0]])
+
+    # Selected states and counties as a date-indexed frame of the given measure (see MEASURES)
+    def series(self, states=(), counties=(), measure='cumulative'):
+        block, labels = self.cumulative(states, counties)
+        if measure != 'cumulative':
+            block = np.diff(block, axis=1, prepend=0)
+        if measure == 'daily_avg7':
+            block = rolling_mean(block, 7)
+        return pd.DataFrame(block.T, index=self.dates, columns=labels)
+
+
+# Labels made unique for lookup: repeats of a label get ' (2)', ' (3)', ... in row order
+def unique_labels(labels):
+    labels = pd.Series(labels, dtype=object)
+    repeat = labels.groupby(labels, sort=False).cumcount().to_numpy()
+    suffix = np.where(repeat > 0, ' (' + (repeat + 1).astype(str).astype(object) + ')', '')
+    return pd.Index(labels.to_numpy() + suffix)
+
+
+# Trailing mean over `window` columns of every row at once (shorter windows at the start), via running sums
+def rolling_mean(block, window):
+    sums = np.cumsum(block, axis=1, dtype=np.float64)
+    sums[:, window:] = sums[:, window:] - sums[:, :-window].copy()
+    return sums / np.minimum(np.arange(1, block.shape[1] + 1), window)
+
+#############################################################################################################################
+
+# Time-lapse maps are animated this many frames at a time: each chunk is one figure sent to the browser
+TIMELAPSE_FRAMES = 52
+
+
+# Every region's value at every date of a time-lapse map, as one dates x regions float32 array, with a single
+# color scale for the whole period so that frames are comparable. Animation frames are rows of this array.
+@dataclass(frozen=True)
+class FrameCube:
+    values: np.ndarray      # float32, one row per date, one column per region
+    dates: pd.DatetimeIndex
+    regions: pd.Index       # map location of every column (postal code, zip code)
+    zmin: float
+    zmax: float
+
+    # Cube of a date-indexed frame (one column per region), keeping every `step`-th date counted back from the
+    # latest. The color scale tops out at a high quantile, so a few outlier days don't wash out every other frame.
+    @classmethod
+    def from_frame(cls, frame, step=1, quantile=0.99):
+        rows = np.arange(len(frame) - 1, -1, -step)[::-1]
+        values = frame.to_numpy(dtype=np.float32)[rows]
+        values.setflags(write=False)  # shared by every session, like CaseMatrix.values
+        finite = values[np.isfinite(values)]
+        zmin = float(min(finite.min(), 0)) if len(finite) else 0.0
+        zmax = float(np.quantile(finite, quantile)) if len(finite) else 1.0
+        return cls(values, frame.index[rows], pd.Index(frame.columns), zmin, max(zmax, zmin + 1))
+
+    # (label, start, stop) row windows of at most `size` dates, oldest first. Windows are counted back from the
+    # latest date, so only the oldest one can be short.
+    def chunks(self, size=TIMELAPSE_FRAMES):
+        bounds = [(max(stop - size, 0), stop) for stop in range(len(self.dates), 0, -size)][::-1]
+        return [(f'{self.dates[start]:%b %d, %Y} to {self.dates[stop - 1]:%b %d, %Y}', start, stop)
+                for start, stop in bounds]
+
+    # Dates and values of one window, rounded to what a color scale can show
+    def frames(self, start, stop, decimals=1):
+        return self.dates[start:stop], np.round(self.values[start:stop], decimals)
+
+#############################################################################################################################
+
+# Time frame choices shared by every time series chart: label -> days back from the latest date
+# (None for the whole series, 'custom' for a range picked by the user)
+TIMEFRAMES = {
+    'Past Year':365,
+    '90 Days':90,
+    '30 Days':30,
+    '14 Days':14,
+    'Past Week':7,
+    'All time':None,
+    'Custom range':'custom'
+}
+
+
+# [start, end] of a preset time frame ending at the latest date; (None, None) means the whole series
+def timeframe_range(timeframe, latest):
+    days = TIMEFRAMES[timeframe]
+    if days is None:
+        return None, None
+    return latest - pd.Timedelta(days=days - 1), latest
+
+
+# Rows of a frame (or series) with an ascending DatetimeIndex between start and end, both inclusive.
+# Found by binary search on the index, so gaps or duplicate days in the data don't shift the window.
+def query_range(frame, start=None, end=None):
+    index = frame.index
+    if not index.is_monotonic_increasing:
+        raise ValueError('query_range needs an ascending DatetimeIndex')
+    lo = 0 if start is None else index.searchsorted(pd.Timestamp(start), side='left')
+    hi = len(index) if end is None else index.searchsorted(pd.Timestamp(end), side='right')
+    return frame.iloc[lo:hi]
+
+#############################################################################################################################
+
+# Pre-aggregated resolutions, coarsest first: name -> (resample rule, approximate days per point)
+RESOLUTIONS = {
+    'monthly': (pd.offsets.MonthEnd(), 30.44),
+    'weekly': (pd.offsets.Week(weekday=6), 7),
+}
+
+
+# Weekly and monthly sum, mean and max of every column of a daily, date-indexed frame.
+# Columns of each rollup are (series, stat); each row is labelled with the last day of its period.
+def build_rollups(daily):
+    return {name: daily.resample(rule).agg(['sum', 'mean', 'max']) for name, (rule, days) in RESOLUTIONS.items()}
+
+
+# The finest resolution whose points over [start, end] fit in the point budget of a chart `width` pixels wide:
+# the daily rows themselves, or one stat of a rollup. Returns (frame, resolution name).
+def query_resolution(daily, rollups, start, end, stat, width):
+    window = query_range(daily, start, end)
+    span = (window.index[-1] - window.index[0]).days + 1 if len(window) else 0
+    if span <= point_budget(width):
+        return window, 'daily'
+    fits = [name for name, (rule, days) in RESOLUTIONS.items() if span / days <= point_budget(width)]
+    name = fits[-1] if fits else next(iter(RESOLUTIONS))
+    rule = RESOLUTIONS[name][0]
+    return _rollup_range(window, rollups[name].xs(stat, axis=1, level=1), rule, stat), name
+
+
+# One stat of every period overlapping the window. Whole periods come from the rollup; the first and last ones
+# usually stick out of the window, so they are aggregated from its daily rows, and the last is labelled with the
+# last date in the window rather than the end of its period.
+def _rollup_range(window, rollup, rule, stat):
+    first, last = rule.rollforward(window.index[0]), rule.rollforward(window.index[-1])
+    head = window.loc[:first].resample(rule).agg(stat)
+    if first == last:
+        return head.set_axis([window.index[-1]])
+    tail = window.loc[window.index > last - rule].resample(rule).agg(stat)
+    inner = rollup.loc[(rollup.index > first) & (rollup.index < last)]
+    return pd.concat([head, inner, tail.set_axis([window.index[-1]])])
+
+#############################################################################################################################
+
+# Roughly one point every two pixels is as much detail as a line chart can show
+def point_budget(width, pixels_per_point=2):
+    return max(int(width // pixels_per_point), 3)
+
+
+# Largest-Triangle-Three-Buckets: keep `threshold` points that preserve the visual shape of the series.
+# x may be numeric or datetime64; the first and last points are always kept.
+def lttb(x, y, threshold):
+    x, y = np.asarray(x), np.asarray(y)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return x, y
+
+    xf = (x.view('int64') if np.issubdtype(x.dtype, np.datetime64) else x).astype(np.float64)
+    yf = y.astype(np.float64)
+    every = (n - 2) / (threshold - 2)
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        # Average of the next bucket (just the last point for the final bucket, and the current point for a
+        # bucket that is all gaps)
+        avg_x = xf[end:next_end].mean() if next_end > end else xf[-1]
+        if next_end <= end:
+            avg_y = yf[-1]
+        elif np.isnan(yf[end:next_end]).all():
+            avg_y = yf[a]
+        else:
+            avg_y = np.nanmean(yf[end:next_end])
+        area = np.abs((xf[a] - avg_x) * (yf[start:end] - yf[a])
+                      - (xf[a] - xf[start:end]) * (avg_y - yf[a]))
+        a = start + int(np.argmax(np.nan_to_num(area, nan=-1)))
+        keep[i + 1] = a
+    return x[keep], y[keep]
+
+
+# x/y arguments for a go.Scatter of a date-indexed series, downsampled to what a chart of this width can show
+def line_points(series, width):
+    x, y = lttb(series.index.values, series.to_numpy(), point_budget(width))
+    return dict(x=x, y=y)